@@ -0,0 +1,194 @@
+"""2-D 氣流場模擬：把畫布網格化，傢俱當作實心格，風扇/冷氣出風口當作速度源
+
+每一步做守恆形式的上風平流 + 擴散 + 阻尼，速度場與冷空氣濃度一起更新，
+全部以 NumPy 陣列運算完成；多台設備同時作用。參數與 static/app.js 的 DEVICE_PRESET 相同。
+"""
+import math
+from collections.abc import Mapping
+import numpy as np
+
+from engine import DEFAULT_CANVAS, DEVICE_PRESET, FURN_SIZE, to_number
+
+CELL = 10          # 每格邊長（px）
+FRAMES = 120       # 模擬的動畫幀數，約等於粒子平均壽命
+CFL = 0.45         # 每步最多前進的格數，決定時間步長
+VISCOSITY = 0.03   # 擴散係數（格²/幀），讓噴流往兩側散開
+DRAG = 0.995       # 每幀的速度衰減
+COOL_DECAY = 0.99  # 冷空氣與室內熱空氣混合、每幀回溫的比例
+PARTICLE_SPEEDUP = 1.4  # 前端粒子速度 = speed × (1.1~1.7)，取平均
+# 網格格數上限：畫布再大也只把格子放大，維持在預設畫布解析度的 4 倍以內，耗時與記憶體固定
+MAX_CELLS = 4 * math.ceil(DEFAULT_CANVAS[0] / CELL) * math.ceil(DEFAULT_CANVAS[1] / CELL)
+FIELD_MAX_SIDE = 100   # ?fields=1 回傳的網格每邊最多幾格，超過就抽樣
+
+
+def _grid(canvas_w, canvas_h, cell):
+    """回傳 (nx, ny, cell)；格數超過 MAX_CELLS 時加大 cell"""
+    cell = max(cell, math.sqrt(canvas_w * canvas_h / MAX_CELLS))
+    nx = max(2, int(math.ceil(canvas_w / cell)))
+    ny = max(2, int(math.ceil(canvas_h / cell)))
+    return nx, ny, cell
+
+
+def _items(items):
+    devices, furniture = [], []
+    for it in items or []:
+        if not isinstance(it, Mapping):
+            continue
+        kind = it.get("kind")
+        preset = DEVICE_PRESET.get(kind)
+        dw, dh = (preset["w"], preset["h"]) if preset else FURN_SIZE.get(it.get("type"), (60, 60))
+        w, h = to_number(it.get("w"), dw) or dw, to_number(it.get("h"), dh) or dh
+        x, y, a = to_number(it.get("x")), to_number(it.get("y")), to_number(it.get("angle"))
+        (devices if preset else furniture).append((kind, x + w / 2, y + h / 2, w, h, a))
+    return devices, furniture
+
+
+def rasterize(furniture, nx, ny, cell=CELL):
+    """傢俱（可旋轉矩形）→ 實心格遮罩 (ny, nx)"""
+    if not furniture:
+        return np.zeros((ny, nx), dtype=bool)
+    cx, cy, w, h, a = np.array([f[1:] for f in furniture], dtype=float).T
+    xs = (np.arange(nx) + 0.5) * cell
+    ys = (np.arange(ny) + 0.5) * cell
+    dx = xs[None, None, :] - cx[:, None, None]
+    dy = ys[None, :, None] - cy[:, None, None]
+    cos, sin = np.cos(a)[:, None, None], np.sin(a)[:, None, None]
+    lx = dx * cos + dy * sin
+    ly = -dx * sin + dy * cos
+    return ((np.abs(lx) <= w[:, None, None] / 2) & (np.abs(ly) <= h[:, None, None] / 2)).any(0)
+
+
+def _sources(devices, nx, ny, cell):
+    """每台設備的出風口展開成一排速度源格，方向依 spreadDeg 呈扇形"""
+    idx, su, sv, cool = [], [], [], []
+    for kind, cx, cy, w, h, a in devices:
+        preset = DEVICE_PRESET[kind]
+        d = np.array([math.cos(a), math.sin(a)])
+        n = np.array([-d[1], d[0]])
+        outlet = np.array([cx + d[0] * w / 2, cy + d[1] * h / 2]) + d * cell * 0.5
+        width = min(w, h)
+        t = np.linspace(-0.5, 0.5, max(3, int(width / cell) * 2 + 1))
+        pos = outlet[None] + t[:, None] * width * n[None]
+        ang = a + t * math.radians(preset["spread_deg"])
+        speed = preset["speed"] * PARTICLE_SPEEDUP / cell   # 格/幀
+        ix = np.clip((pos[:, 0] / cell).astype(int), 0, nx - 1)
+        iy = np.clip((pos[:, 1] / cell).astype(int), 0, ny - 1)
+        idx.append(iy * nx + ix)
+        su.append(np.cos(ang) * speed)
+        sv.append(np.sin(ang) * speed)
+        cool.append(np.full(len(t), kind == "ac"))
+    if not idx:
+        return np.zeros(0, int), np.zeros(0), np.zeros(0), np.zeros(0, bool)
+    return np.concatenate(idx), np.concatenate(su), np.concatenate(sv), np.concatenate(cool)
+
+
+def _advect(fields, dt):
+    """守恆形式的一階上風平流：通量由面速度決定，噴流前緣能以正確速度推進、撞牆不會穿透"""
+    u, v = fields[0], fields[1]
+    ax = 0.5 * (u[:, :-1] + u[:, 1:])
+    fx = ax * np.where(ax > 0, fields[:, :, :-1], fields[:, :, 1:])
+    ay = 0.5 * (v[:-1] + v[1:])
+    fy = ay * np.where(ay > 0, fields[:, :-1], fields[:, 1:])
+    out = fields.copy()
+    out[:, :, :-1] -= dt * fx
+    out[:, :, 1:] += dt * fx
+    out[:, :-1] -= dt * fy
+    out[:, 1:] += dt * fy
+    return out
+
+
+def _laplacian(fields):
+    p = np.pad(fields, ((0, 0), (1, 1), (1, 1)), mode="edge")
+    return p[:, :-2, 1:-1] + p[:, 2:, 1:-1] + p[:, 1:-1, :-2] + p[:, 1:-1, 2:] - 4 * fields
+
+
+def simulate(data, cell=CELL, frames=FRAMES):
+    """回傳 dict：u/v/speed（px/幀）、cool（0~1 冷空氣濃度）、solid 遮罩與各項氣流指標"""
+    canvas = data.get("canvas_size") or {}
+    canvas = canvas if isinstance(canvas, Mapping) else {}
+    cw = to_number(canvas.get("width"), DEFAULT_CANVAS[0]) or DEFAULT_CANVAS[0]
+    ch = to_number(canvas.get("height"), DEFAULT_CANVAS[1]) or DEFAULT_CANVAS[1]
+    nx, ny, cell = _grid(cw, ch, cell)
+
+    devices, furniture = _items(data.get("items"))
+    solid = rasterize(furniture, nx, ny, cell)
+    src, su, sv, src_cool = _sources(devices, nx, ny, cell)
+    solid.flat[src] = False   # 設備放在傢俱上時，出風口仍然有效
+    open_ = ~solid
+
+    # fields[0], fields[1] = 速度 u, v（格/幀）；fields[2] = 冷空氣濃度
+    fields = np.zeros((3, ny, nx))
+    src_speed = np.hypot(su, sv)
+    vmax = float(src_speed.max()) if len(src) else 0.0
+    dt = CFL / vmax if vmax else 1.0
+    steps = int(math.ceil(frames / dt)) if len(src) else 0
+    dt = frames / steps if steps else dt
+    nu = min(VISCOSITY * dt, 0.2)   # 顯式擴散的穩定條件
+    drag = DRAG ** dt
+    cool_decay = COOL_DECAY ** dt
+    blocked = 0.0
+    injected = float(src_speed.sum()) * steps
+
+    for _ in range(steps):
+        fields = _advect(fields, dt)
+        fields += nu * _laplacian(fields)
+        fields[:2] *= drag
+        fields[2] *= cool_decay
+        # 多股氣流對撞處動量會堆積；限制不超過出風速度，維持 CFL 穩定
+        mag = np.hypot(fields[0], fields[1])
+        fields[:2] *= np.minimum(1.0, vmax / np.maximum(mag, 1e-12))
+        np.clip(fields[2], 0.0, 1.0, out=fields[2])
+        # 撞上傢俱的動量被吸收，累計起來當作「被阻擋」的比例
+        blocked += float(np.hypot(fields[0][solid], fields[1][solid]).sum())
+        fields[:, solid] = 0.0
+        fields[0].flat[src] = su
+        fields[1].flat[src] = sv
+        fields[2].flat[src[src_cool]] = 1.0
+
+    u, v, cool = fields[0] * cell, fields[1] * cell, fields[2]
+    speed = np.hypot(u, v)
+    ref = max((DEVICE_PRESET[d[0]]["speed"] for d in devices), default=1.0) * PARTICLE_SPEEDUP
+    moving = (speed > 0.1 * ref) & open_
+    open_cells = max(1, int(open_.sum()))
+    coverage = float(moving.sum()) / open_cells
+    cool_coverage = float(((cool > 0.2) & open_).sum()) / open_cells
+    mean_speed = float(speed[open_].mean()) if open_.any() else 0.0
+    if moving.any():
+        s = speed[moving]
+        uniformity = float(1 / (1 + s.std() / s.mean()))
+    else:
+        uniformity = 0.0
+    blocked_ratio = min(1.0, blocked / injected) if injected else 0.0
+
+    raw = (0.6 * min(1.0, coverage / 0.15) + 0.4 * uniformity) * max(0.0, 1 - 2 * blocked_ratio)
+    score = int(min(10, max(1, round(1 + 9 * raw)))) if devices else 1
+
+    return {
+        "cell": cell,
+        "shape": (ny, nx),
+        "u": u, "v": v, "speed": speed, "cool": cool, "solid": solid,
+        "metrics": {
+            "coverage": round(coverage, 4),
+            "cool_coverage": round(cool_coverage, 4),
+            "mean_speed": round(mean_speed, 4),
+            "uniformity": round(uniformity, 4),
+            "blocked_ratio": round(blocked_ratio, 4),
+            "氣流效率": score,
+        },
+    }
+
+
+def field_payload(result, decimals=2, max_side=FIELD_MAX_SIDE):
+    """把模擬結果轉成可 JSON 化的 dict（速度與冷空氣場四捨五入、每邊超過 max_side 格時等間隔抽樣，以縮小回應）"""
+    step = max(1, math.ceil(max(result["shape"]) / max_side))
+    pick = lambda a: a[::step, ::step]
+    solid = pick(result["solid"])
+    return {
+        "cell": result["cell"] * step,
+        "shape": list(solid.shape),
+        "speed": np.round(pick(result["speed"]), decimals).tolist(),
+        "u": np.round(pick(result["u"]), decimals).tolist(),
+        "v": np.round(pick(result["v"]), decimals).tolist(),
+        "cool": np.round(pick(result["cool"]), decimals).tolist(),
+        "solid": solid.astype(int).tolist(),
+    }
@@ -0,0 +1,121 @@
+"""每日 / 每小時彙總：寫入執行緒每次 commit 時在同一個 transaction 裡累加，查詢只讀彙總表
+
+每個時段一列（加上建議溫度分布），圖表讀取的成本只和查詢的時段數有關，與累積了多少原始資料無關。
+所有建議結果都計入彙總（只有計數與分數，不含佈局）；原始佈局只在使用者同意時才存。
+"""
+import datetime, os
+from zoneinfo import ZoneInfo
+
+ANALYTICS_TZ = ZoneInfo(os.getenv("ANALYTICS_TZ", "Asia/Taipei"))
+PERIODS = {"day": "%Y-%m-%d", "hour": "%Y-%m-%dT%H"}
+ENERGY_LEVELS = {"低": "energy_low", "中": "energy_mid", "高": "energy_high"}
+MAX_BUCKETS = {"day": 366, "hour": 24 * 14}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    period TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 0,
+    degraded INTEGER NOT NULL DEFAULT 0,
+    comfort_sum INTEGER NOT NULL DEFAULT 0,
+    comfort_n INTEGER NOT NULL DEFAULT 0,
+    airflow_sum INTEGER NOT NULL DEFAULT 0,
+    airflow_n INTEGER NOT NULL DEFAULT 0,
+    energy_low INTEGER NOT NULL DEFAULT 0,
+    energy_mid INTEGER NOT NULL DEFAULT 0,
+    energy_high INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (period, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_temps (
+    period TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    temp INTEGER NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (period, bucket, temp)
+) WITHOUT ROWID;
+"""
+
+COLUMNS = ("requests", "degraded", "comfort_sum", "comfort_n", "airflow_sum", "airflow_n",
+           "energy_low", "energy_mid", "energy_high")
+
+UPSERT = f"""
+INSERT INTO rollups (period, bucket, {", ".join(COLUMNS)}) VALUES (?, ?, {", ".join("?" * len(COLUMNS))})
+ON CONFLICT (period, bucket) DO UPDATE SET {", ".join(f"{c} = {c} + excluded.{c}" for c in COLUMNS)}
+"""
+
+UPSERT_TEMP = """
+INSERT INTO rollup_temps (period, bucket, temp, n) VALUES (?, ?, ?, ?)
+ON CONFLICT (period, bucket, temp) DO UPDATE SET n = n + excluded.n
+"""
+
+
+def bucket(ts, period):
+    return datetime.datetime.fromtimestamp(ts, ANALYTICS_TZ).strftime(PERIODS[period])
+
+
+def apply(conn, samples):
+    """samples：(created, engine, comfort, airflow, energy, recommended_temp)；先在記憶體合併，每個時段只 upsert 一次"""
+    totals, temps = {}, {}
+    for created, engine, comfort, airflow, energy, temp in samples:
+        for period in PERIODS:
+            key = (period, bucket(created, period))
+            t = totals.setdefault(key, dict.fromkeys(COLUMNS, 0))
+            t["requests"] += 1
+            t["degraded"] += engine == "degraded"
+            if comfort is not None:
+                t["comfort_sum"] += comfort
+                t["comfort_n"] += 1
+            if airflow is not None:
+                t["airflow_sum"] += airflow
+                t["airflow_n"] += 1
+            if energy in ENERGY_LEVELS:
+                t[ENERGY_LEVELS[energy]] += 1
+            if temp is not None:
+                temps[key + (temp,)] = temps.get(key + (temp,), 0) + 1
+    conn.executemany(UPSERT, [key + tuple(t[c] for c in COLUMNS) for key, t in totals.items()])
+    conn.executemany(UPSERT_TEMP, [key + (n,) for key, n in temps.items()])
+
+
+def _avg(total, n):
+    return round(total / n, 2) if n else None
+
+
+def query(conn, period="day", count=30, now=None):
+    """最近 count 個時段（含沒有資料的時段），依時間排序"""
+    count = max(1, min(int(count), MAX_BUCKETS[period]))
+    step = datetime.timedelta(days=1) if period == "day" else datetime.timedelta(hours=1)
+    end = datetime.datetime.fromtimestamp(now, ANALYTICS_TZ) if now else datetime.datetime.now(ANALYTICS_TZ)
+    keys = [(end - step * i).strftime(PERIODS[period]) for i in reversed(range(count))]
+
+    rows = conn.execute(
+        f"SELECT bucket, {', '.join(COLUMNS)} FROM rollups WHERE period = ? AND bucket BETWEEN ? AND ?",
+        (period, keys[0], keys[-1]),
+    ).fetchall()
+    by_bucket = {r[0]: dict(zip(COLUMNS, r[1:])) for r in rows}
+    temps = {}
+    for b, temp, n in conn.execute(
+        "SELECT bucket, temp, n FROM rollup_temps WHERE period = ? AND bucket BETWEEN ? AND ?",
+        (period, keys[0], keys[-1]),
+    ):
+        temps.setdefault(b, {})[temp] = n
+
+    series, temp_total = [], {}
+    for key in keys:
+        t = by_bucket.get(key) or dict.fromkeys(COLUMNS, 0)
+        for temp, n in temps.get(key, {}).items():
+            temp_total[temp] = temp_total.get(temp, 0) + n
+        series.append({
+            "bucket": key,
+            "requests": t["requests"],
+            "degraded": t["degraded"],
+            "avg_comfort": _avg(t["comfort_sum"], t["comfort_n"]),
+            "avg_airflow": _avg(t["airflow_sum"], t["airflow_n"]),
+            "energy": {label: t[col] for label, col in ENERGY_LEVELS.items()},
+            "recommended_temp": {str(k): v for k, v in sorted(temps.get(key, {}).items())},
+        })
+    return {
+        "period": period,
+        "timezone": str(ANALYTICS_TZ),
+        "series": series,
+        "recommended_temp": {str(k): v for k, v in sorted(temp_total.items())},
+    }
@@ -1,14 +1,69 @@
-import os, math, logging, concurrent.futures, functools
-from flask import Flask, request, jsonify, render_template
-from google import genai
-import json
+import os, math, concurrent.futures, functools, asyncio, itertools, time
+from flask import Flask, g, request, jsonify, render_template, Response, stream_with_context
+import httpx
+from airflow import field_payload, simulate
+import analytics
+from context_cache import ContextCache
+from energy import energy_payload
+from engine import analyze_layout, to_number
+from gemini_client import get_client, warm_up as warm_up_client
+import http_pool
+from jobs import JobFailed, JobQueue, QueueFull
+import jsoncodec
+from jsonstream import StructuredJsonStream
+from layout_cache import layout_key, suggestion_cache
+from layout_codec import encode_canvas, encode_items, normalize_items
+from logpipe import log_exchange, setup_logging
+import metrics
+from models import REQUEST_MAX_BYTES, InvalidRequest, parse_layout, validate_layout
+import ratelimit
+from ratelimit import RATE_LIMIT, RateLimited, client_id, limiters
+from recorder import recorder
+from resilience import gemini_breaker, is_upstream_failure, retry_stats, with_retries, with_retries_async
+from singleflight import suggestion_flight, suggestion_flight_async
+from store import contributions, reader
+import tracing
+from usage import token_usage
 
-logging.basicConfig(level=logging.INFO)
+# 日誌經由佇列交給背景執行緒寫出，請求路徑上不做同步 I/O
+setup_logging()
 app = Flask(__name__)
-API_KEY = os.getenv("API_KEY")
-client = genai.Client(api_key=API_KEY)
+# jsonify / get_json 改用較快的 JSON 編解碼（見 jsoncodec.py）
+app.json = jsoncodec.FastJSONProvider(app)
+app.config["MAX_CONTENT_LENGTH"] = REQUEST_MAX_BYTES
 
 model = "gemini-2.5-flash"
+# 修改 prompt 內容時請一併調整，舊的快取結果就不會再被使用
+PROMPT_VERSION = "v3"
+# 每個請求等待 Gemini 的上限（秒），逾時改回本地分析結果
+GEMINI_DEADLINE = float(os.getenv("GEMINI_DEADLINE", "25"))
+# gemini：呼叫 LLM（逾時/故障時才用本地引擎）；local：完全離線，只用本地規則引擎
+SUGGESTION_ENGINE = os.getenv("SUGGESTION_ENGINE", "gemini")
+# 429/503 等暫時性錯誤的額外重試次數（仍受 deadline 限制）
+GEMINI_RETRIES = int(os.getenv("GEMINI_RETRIES", "2"))
+# 實際呼叫 Gemini 的執行緒；請求端只等到 deadline，不會被卡住的上游綁死
+gemini_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv("GEMINI_POOL_SIZE", "32")), thread_name_prefix="gemini")
+# 批次請求同時呼叫 Gemini 的上限（整個 process 共用），對齊上游的限流額度
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(16 * 1024 * 1024)))
+batch_pool = concurrent.futures.ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="batch")
+# 批次項目實際呼叫 Gemini 的執行緒：逾時的項目不再等待，但上游呼叫會繼續跑完；
+# 跟 gemini_pool 分開，批次真正的上游並行數就不會超過 BATCH_CONCURRENCY，也佔不到互動請求的執行緒
+batch_gemini_pool = concurrent.futures.ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="batch-gemini")
+# /api/jobs：背景執行的 worker 數、排隊上限、完成後保留秒數；long-poll 最多等 JOB_MAX_WAIT 秒
+job_queue = JobQueue(
+    workers=int(os.getenv("JOB_WORKERS", "8")),
+    max_queue=int(os.getenv("JOB_MAX_QUEUE", "256")),
+    ttl=float(os.getenv("JOB_TTL", "600")),
+)
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "30"))
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
 
 @app.route("/")
 def index():
@@ -27,40 +82,18 @@ schema = {
     "required": ["分析","建議","舒適度評分","能耗指數","氣流效率","建議冷氣溫度"]
 }
 
-def call_gemini_sync(prompt,model):
-    return client.models.generate_content(
-        model=model,
-        contents=prompt,
-        config={
-            "temperature": 0.0,  # 隨機性
-            "response_mime_type": "application/json",
-            "response_schema": schema,
-            "tool_config": {"function_calling_config": {"mode": "none"}},
-        }
-    )
+tool_config = {"function_calling_config": {"mode": "none"}}
 
+generate_config = {
+    "temperature": 0.0,  # 隨機性
+    "response_mime_type": "application/json",
+    "response_schema": schema,
+    # SDK 層的 HTTP 逾時（毫秒），確保背景執行緒最終也會放手
+    "http_options": {"timeout": int(GEMINI_DEADLINE * 1000)},
+}
 
-@app.route("/api/suggestions", methods=["POST"])
-def api_suggestions():
-    try:
-        data = request.get_json(force=True) or {}
-        ac_temp = data.get("ac_temp")  # 空調設定溫度
-        room_template = data.get("room_template")  # 房型模板
-        items = data.get("items", [])  # 傢俱物件清單
-        canvas_size = data.get("canvas_size", {})  # 畫布尺寸
-
-        # 將物件的弧度轉換為角度，方便閱讀
-        pretty_items = []
-        for it in items:
-            pretty_items.append({
-                "type": it.get("type"),
-                "kind": it.get("kind"),
-                "x": it.get("x"), "y": it.get("y"),
-                "w": it.get("w"), "h": it.get("h"),
-                "angle_deg": round((it.get("angle") or 0) * 180.0 / math.pi, 1)
-            })
-
-        prompt = f"""
+# 每個請求都相同的部分：角色、範例、輸出欄位定義
+SYSTEM_INSTRUCTION = """
 **Situation**
 您是一位專業的台灣居家節能顧問，正在為台灣住戶提供個人化的節能建議。您需要根據特定的居家環境資訊，提供最適當的建議
 台灣夏季具有高溫潮濕環境（濕度常超過70%）、午後西曬嚴重的氣候特徵，這些環境因素直接影響居家用電效率。
@@ -69,18 +102,13 @@ def api_suggestions():
 **examples**
 1) 風扇/冷氣的方向或位置如何調整（若有）
 2) 哪些大型傢俱需要移動/避開出風口
-[{{'type': 'table', 'kind': 'furniture', 'x': 308, 'y': 187, 'w': 90, 'h': 60, 'angle_deg': 0.0}},
- {{'type': 'fan',   'kind': 'fan',       'x': 184, 'y': 173, 'w': 70, 'h': 50, 'angle_deg': 0.0}},
- {{'type': 'bed',   'kind': 'furniture', 'x': 470, 'y': 193, 'w': 140,'h': 70, 'angle_deg': 0.0}}]
+type,kind,x,y,w,h,angle_deg
+table,furniture,308,187,90,60,0
+fan,fan,184,173,70,50,0
+bed,furniture,470,193,140,70,0
 例如這種狀況，很明顯因為桌子擋到了風扇吹過來的風，這時可以提供：移動桌子避免擋到風的流通。
 
-**Task**
-以下是模擬畫布與擺設資訊：
-- 畫布尺寸（像素）：{canvas_size}
-- 空調設定溫度：{ac_temp}°C
-- 房型：{room_template}
-- 物件清單（位置/尺寸/角度）：{pretty_items}
-
+**輸出**
 請輸出以下內容:
 "分析":當前環境的優缺點識別，提供詳細的環境狀況分析
 "建議":提供具體可行的改善措施
@@ -88,32 +116,657 @@ def api_suggestions():
 "能耗指數":需考慮空調運轉效率，決定[低、中、高]
 "氣流效率":評估空氣循環狀況、通風效果和溫度分布均勻度，使用1-10分制評分
 "建議冷氣溫度":冷氣溫度需平衡舒適度與節能需求
+"""
+
+# 固定指令放進 Gemini 明確快取，請求只送佈局資料；快取還沒建好時改為直接帶 system_instruction
+context_cache = ContextCache(
+    get_client, model, PROMPT_VERSION, SYSTEM_INSTRUCTION, tool_config,
+    ttl=float(os.getenv("CONTEXT_CACHE_TTL", "3600")),
+    executor=gemini_pool,
+    # 目前的 system instruction 約 420 tokens，低於 gemini-2.5-flash 明確快取的最小 1024 tokens，預設不開；
+    # 固定內容（範例、schema 說明）加到門檻以上再設 CONTEXT_CACHE=1
+    enabled=os.getenv("CONTEXT_CACHE", "0") == "1",
+)
+
+
+def gemini_config():
+    name = context_cache.name()
+    if context_cache.enabled:
+        metrics.cache_lookup("context", name is not None)
+    if name is not None:
+        return {**generate_config, "cached_content": name}
+    return {**generate_config, "system_instruction": SYSTEM_INSTRUCTION, "tool_config": tool_config}
 
+
+def warm_up():
+    # 由 gunicorn post_fork 在背景呼叫：先打開 Gemini 連線，並開始建立 context cache
+    if recorder.replaying:
+        recorder.load()
+        return
+    warm_up_client(model)
+    context_cache.name()
+
+
+def call_gemini_sync(prompt,model, key=None):
+    # 暫時性錯誤以抖動指數退避重試；Gemini 持續失敗時斷路器直接擋下，不再空等
+    if recorder.replaying:
+        return recorder.replay(key)
+    with metrics.gemini_inflight.track_inprogress(), tracing.span("call_gemini_sync", model=model):
+        return gemini_breaker.call(
+            with_retries, get_client().models.generate_content,
+            model=model,
+            contents=prompt,
+            config=gemini_config(),
+            attempts=GEMINI_RETRIES + 1, deadline=GEMINI_DEADLINE,
+        )
+
+
+def call_gemini_with_deadline(prompt, model, timeout=None, key=None, pool=gemini_pool):
+    future = tracing.submit(pool, call_gemini_sync, prompt, model, key)
+    try:
+        return future.result(timeout=GEMINI_DEADLINE if timeout is None else timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise DeadlineExceeded(f"Gemini 超過 {GEMINI_DEADLINE:g} 秒未回應")
+    except httpx.TimeoutException as e:
+        raise DeadlineExceeded(f"Gemini 連線逾時：{e}") from e
+
+
+def call_gemini_stream(prompt, model):
+    # 串流版本：邊產生邊回傳 JSON 片段
+    return get_client().models.generate_content_stream(
+        model=model,
+        contents=prompt,
+        config=gemini_config(),
+    )
+
+
+async def call_gemini_async(prompt, model, key=None):
+    # 非同步版本：等待 Gemini 時不佔用執行緒，給 ASGI 入口（asgi.py）使用
+    if recorder.replaying:
+        return await recorder.replay_async(key)
+    with metrics.gemini_inflight.track_inprogress():
+        return await gemini_breaker.call_async(
+            with_retries_async, get_client().aio.models.generate_content,
+            model=model,
+            contents=prompt,
+            config=gemini_config(),
+            attempts=GEMINI_RETRIES + 1, deadline=GEMINI_DEADLINE,
+        )
+
+
+def build_prompt(ac_temp, room_template, canvas_size, item_table):
+    return f"""
+**Task**
+以下是模擬畫布與擺設資訊：
+- 畫布尺寸（寬x高，像素）：{canvas_size}
+- 空調設定溫度：{ac_temp}°C
+- 房型：{room_template}
+- 物件清單（CSV，第一行為欄位，每件物品一行；x/y/w/h 為像素，angle_deg 為角度）：
+{item_table}
 """
-        print(prompt)
-
-        response = call_gemini_sync(prompt,model)
-        text = json.loads(response.text)
-        print(text)
-        return jsonify({
-            "suggestions": text.get("建議", []),
-            "analysis": text.get("分析", []),
-            "metrics": {
-                "舒適度評分": text.get("舒適度評分"),
-                "能耗指數": text.get("能耗指數"),
-                "氣流效率": text.get("氣流效率"),
-                "建議冷氣溫度": text.get("建議冷氣溫度"),
-            }
-        })
 
+
+def render_prompt(data):
+    with tracing.span("encode_items"):
+        items = normalize_items(data.get("items"))
+        item_table = encode_items(items)  # 傢俱物件清單（精簡表格）
+        tracing.annotate(items=len(items))
+    return build_prompt(
+        data.get("ac_temp"),  # 空調設定溫度
+        data.get("room_template"),  # 房型模板
+        encode_canvas(data.get("canvas_size")),  # 畫布尺寸
+        item_table,
+    )
+
+
+def fetch_suggestions(data, key, timeout=None, source="sync", pool=gemini_pool):
+    # 前一個相同請求可能剛好完成並寫入快取
+    cached = suggestion_cache.peek(key)
+    if cached is not None:
+        return cached
+    with metrics.stage(source, "build_prompt"):
+        prompt = render_prompt(data)
+
+    started = time.monotonic()
+    try:
+        with metrics.stage(source, "gemini"):
+            response = call_gemini_with_deadline(prompt, model, timeout, key, pool)
+    except Exception as e:
+        metrics.upstream_error(e)
+        raise
+    recorder.record(key, data, response, time.monotonic() - started, source)
+    token_usage.record(response, source)
+    log_exchange(app.logger, key, prompt, response.text, time.monotonic() - started, source)
+    with metrics.stage(source, "parse_response"):
+        result = model_output(response)
+    suggestion_cache.put(key, result)
+    return result
+
+
+async def fetch_suggestions_async(data, key):
+    cached = suggestion_cache.peek(key)
+    if cached is not None:
+        return cached
+    with metrics.stage("async", "build_prompt"):
+        prompt = render_prompt(data)
+
+    started = time.monotonic()
+    try:
+        with metrics.stage("async", "gemini"):
+            response = await asyncio.wait_for(call_gemini_async(prompt, model, key), GEMINI_DEADLINE)
+    except (asyncio.TimeoutError, httpx.TimeoutException) as e:
+        metrics.upstream_error(e)
+        raise DeadlineExceeded(f"Gemini 超過 {GEMINI_DEADLINE:g} 秒未回應") from e
     except Exception as e:
-        app.logger.exception("Gemini API 發生錯誤")
-        return jsonify({
-            "error": str(e),
-            "suggestions": [
-                "出事了謝謝",
-            ]
-        }), 500
+        metrics.upstream_error(e)
+        raise
+    recorder.record(key, data, response, time.monotonic() - started, "async")
+    token_usage.record(response, "async")
+    log_exchange(app.logger, key, prompt, response.text, time.monotonic() - started, "async")
+    with metrics.stage("async", "parse_response"):
+        result = model_output(response)
+    suggestion_cache.put(key, result)
+    return result
+
+
+def model_output(response):
+    # 設了 response_schema 時 SDK 已經把輸出解析成 response.parsed，不再重新 parse 一次文字；
+    # 沒有 parsed 的回應（測試替身、舊的錄製檔）才解析 text
+    parsed = getattr(response, "parsed", None)
+    if parsed is None:
+        return jsoncodec.loads(response.text)
+    return parsed
+
+
+def format_result(text):
+    return {
+        "suggestions": text.get("建議", []),
+        "analysis": text.get("分析", []),
+        "metrics": {
+            "舒適度評分": text.get("舒適度評分"),
+            "能耗指數": text.get("能耗指數"),
+            "氣流效率": text.get("氣流效率"),
+            "建議冷氣溫度": text.get("建議冷氣溫度"),
+        }
+    }
+
+
+def local_result(data):
+    result = format_result(analyze_layout(data))
+    result["engine"] = "local"
+    return result
+
+
+def degraded_result(data):
+    # Gemini 來不及回應時的本地結果，degraded 讓前端知道這不是 AI 產生的
+    result = local_result(data)
+    result["degraded"] = True
+    return result
+
+
+def error_result(e):
+    return {
+        "error": str(e),
+        "suggestions": [
+            "出事了謝謝",
+        ]
+    }
+
+
+def layout_body():
+    # 讀取並驗證佈局請求：格式或範圍不符丟 InvalidRequest（400），超過大小上限由 Flask 回 413
+    return parse_layout(request.get_data(cache=False))
+
+
+def json_body():
+    # 不是單一佈局的請求（批次）：一樣用 jsoncodec 解析，格式錯誤丟 InvalidRequest，回 400 JSON
+    raw = request.get_data(cache=False)
+    try:
+        return jsoncodec.loads(raw) if raw else None
+    except ValueError as e:
+        raise InvalidRequest([{"loc": "", "msg": f"Invalid JSON: {e}"}]) from None
+
+
+@app.errorhandler(InvalidRequest)
+def invalid_request(e):
+    return jsonify({"error": str(e), "details": e.errors}), 400
+
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"error": f"請求超過 {request.max_content_length} bytes 上限"}), 413
+
+
+def rate_limited_body(e):
+    return {"error": str(e), "retry_after": e.retry_after}
+
+
+def too_many_requests(e):
+    return jsonify(rate_limited_body(e)), 429, {"Retry-After": str(e.retry_after)}
+
+
+def rate_limited(group):
+    # 依用戶端限流：額度內直接放行，稍微超過就短暫排隊，再多就回 429
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if RATE_LIMIT:
+                try:
+                    limiters[group].acquire(client_id(request.headers, request.remote_addr))
+                except RateLimited as e:
+                    return too_many_requests(e)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_result(data, body, key=None):
+    # 每個成功的結果都計入彙總統計；使用者勾選「匿名貢獻」才另外保存佈局。只放進佇列，寫入由背景執行緒批次處理
+    if "error" not in body:
+        contributions.submit(data, body, key, store=data.get("contribute") is True)
+
+
+# /api/suggestions 的流程（Flask、/api/jobs 與 asgi.py 共用）：
+# 本地引擎 / 快取 → 呼叫 Gemini（同步或 async 只差這一步）→ 上游故障時降級 → 記錄結果
+
+def cached_suggestion(data):
+    """本地引擎或快取命中時回傳 (結果, key)；需要呼叫 Gemini 時結果為 None"""
+    if SUGGESTION_ENGINE == "local":
+        return local_result(data), None
+    # 同一個佈局（不論螢幕大小）直接回傳快取結果
+    key = layout_key(data, model, PROMPT_VERSION)
+    text = suggestion_cache.get(key)
+    tracing.annotate(layout_key=key[:16], cache_hit=text is not None)
+    return (None if text is None else format_result(text)), key
+
+
+def suggestion_failed(data, e):
+    if is_upstream_failure(e):
+        # 逾時、限流重試用盡或斷路器開啟：改回本地分析結果
+        app.logger.warning("Gemini 暫時無法使用（%s），改回本地分析結果", e)
+        return degraded_result(data), 200
+    app.logger.exception("Gemini API 發生錯誤")
+    return error_result(e), 500
+
+
+def finish_suggestion(data, body, status):
+    if status == 200:
+        record_result(data, body)
+    return body, status
+
+
+def suggest(data):
+    """回傳 (回應內容, HTTP 狀態碼)"""
+    try:
+        body, key = cached_suggestion(data)
+        if body is None:
+            # 同時進來的相同佈局只呼叫一次 Gemini，其餘等待共用結果
+            body = format_result(suggestion_flight.do(key, lambda: fetch_suggestions(data, key), timeout=GEMINI_DEADLINE))
+        status = 200
+    except Exception as e:
+        body, status = suggestion_failed(data, e)
+    return finish_suggestion(data, body, status)
+
+
+async def suggest_async(data):
+    """suggest 的 async 版本（asgi.py）：等待 Gemini 時不佔用執行緒"""
+    try:
+        body, key = cached_suggestion(data)
+        if body is None:
+            body = format_result(await suggestion_flight_async.do(
+                key, lambda: fetch_suggestions_async(data, key), timeout=GEMINI_DEADLINE))
+        status = 200
+    except Exception as e:
+        body, status = suggestion_failed(data, e)
+    return finish_suggestion(data, body, status)
+
+
+@app.route("/api/suggestions", methods=["POST"])
+@rate_limited("suggestions")
+def api_suggestions():
+    with metrics.stage("sync", "parse_request"):
+        data = layout_body()
+    body, status = suggest(data)
+    with metrics.stage("sync", "serialize"):
+        return jsonify(body), status
+
+
+def suggestion_job(data):
+    # 背景工作在 POST 回應之後才執行，自己開一個 trace
+    with tracing.trace("job suggestion"):
+        body, status = suggest(data)
+    if status >= 500:
+        raise JobFailed(body)
+    return body
+
+
+@app.route("/api/jobs", methods=["POST"])
+@rate_limited("suggestions")
+def api_jobs_submit():
+    # 立刻回傳 job id；結果用 GET /api/jobs/<id>?wait=秒 取得，格式與 /api/suggestions 相同
+    data = layout_body()
+    try:
+        job = job_queue.submit(suggestion_job, data)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    return jsonify(job.to_dict()), 202, {"Location": f"/api/jobs/{job.id}"}
+
+
+@app.route("/api/jobs/<job_id>")
+@rate_limited("local")
+def api_jobs_get(job_id):
+    wait = min(max(to_number(request.args.get("wait"), 0.0), 0.0), JOB_MAX_WAIT)
+    job = job_queue.get(job_id, wait)
+    if job is None:
+        return jsonify({"error": "找不到這個工作，可能已經過期"}), 404
+    return jsonify(job.to_dict()), 200 if job.done.is_set() else 202
+
+
+@app.route("/api/suggestions/local", methods=["POST"])
+@rate_limited("local")
+def api_suggestions_local():
+    # 快速路徑：只用本地規則引擎，幾毫秒內回應
+    data = layout_body()
+    body = local_result(data)
+    record_result(data, body)
+    return jsonify(body)
+
+
+@app.route("/api/airflow", methods=["POST"])
+@rate_limited("local")
+def api_airflow():
+    # 伺服器端氣流場模擬；?fields=1 時一併回傳速度/冷空氣網格
+    data = layout_body()
+    result = simulate(data)
+    body = {"metrics": result["metrics"]}
+    if request.args.get("fields"):
+        body["fields"] = field_payload(result)
+    return jsonify(body)
+
+
+@app.route("/api/energy", methods=["POST"])
+@rate_limited("local")
+def api_energy():
+    # 耗電 / 電費 / 碳排估算，完全不經過 LLM；可在 "energy" 欄位指定 setpoints、months、hours、other_kwh
+    data = layout_body()
+    return jsonify(energy_payload(data))
+
+
+def batch_item(data, key, deadline):
+    status, body = _batch_item(data, key, deadline)
+    if status != "error":
+        record_result(data, body, key)
+    return status, body
+
+
+def _batch_item(data, key, deadline):
+    # 批次中的單一佈局：成功 ok、逾時/上游故障改用本地結果 degraded，其餘 error，都不影響其他項目
+    try:
+        if SUGGESTION_ENGINE == "local":
+            return "ok", local_result(data)
+        text = suggestion_cache.get(key)
+        if text is not None:
+            return "cached", format_result(text)
+        text = suggestion_flight.do(key, lambda: fetch_suggestions(data, key, deadline, "batch", batch_gemini_pool),
+                                  timeout=deadline)
+        return "ok", format_result(text)
+    except Exception as e:
+        if is_upstream_failure(e):
+            return "degraded", degraded_result(data)
+        app.logger.exception("批次項目發生錯誤")
+        return "error", error_result(e)
+
+
+def group_layouts(layouts):
+    # 依 canonical key 去重：{key: (代表的佈局, 所有對應的索引)}；驗證不過的項目另外列出 (索引, 錯誤)
+    groups, invalid = {}, []
+    for i, data in enumerate(layouts):
+        try:
+            data = validate_layout(data, i)
+        except InvalidRequest as e:
+            invalid.append((i, e))
+            continue
+        groups.setdefault(layout_key(data, model, PROMPT_VERSION), (data, []))[1].append(i)
+    return groups, invalid
+
+
+def run_batch(groups, deadline):
+    """每個不重複的佈局丟進 batch_pool，依完成順序 yield (索引列表, status, result)"""
+    futures = {
+        tracing.submit(batch_pool, batch_item, data, key, deadline): indexes
+        for key, (data, indexes) in groups.items()
+    }
+    try:
+        for future in concurrent.futures.as_completed(futures):
+            yield futures[future], *future.result()
+    finally:
+        # 用戶端中途斷線時，還沒開始的項目就不必再呼叫 Gemini
+        for future in futures:
+            future.cancel()
+
+
+def batch_deadline(body):
+    # 用戶端可以縮短每個項目的等待上限，範圍 (0, GEMINI_DEADLINE]；格式不對回 400
+    value = body.get("deadline") if isinstance(body, dict) else None
+    if value is None:
+        return GEMINI_DEADLINE
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value <= 0:
+        raise InvalidRequest([{"loc": "deadline", "msg": "必須是大於 0 的秒數"}])
+    return min(float(value), GEMINI_DEADLINE)
+
+
+@app.route("/api/suggestions/batch", methods=["POST"])
+@rate_limited("batch")
+def api_suggestions_batch():
+    # {"layouts": [...], "deadline": 秒}；?stream=1 時以 NDJSON 依完成順序逐筆回傳
+    request.max_content_length = BATCH_MAX_BYTES
+    body = json_body() or {}
+    layouts = body.get("layouts") if isinstance(body, dict) else body
+    if not isinstance(layouts, list):
+        return jsonify({"error": "layouts 必須是陣列"}), 400
+    if len(layouts) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"單次最多 {BATCH_MAX_ITEMS} 筆"}), 413
+    deadline = batch_deadline(body)
+    groups, invalid = group_layouts(layouts)
+    started = time.monotonic()
+
+    def records():
+        counts = {}
+        batches = run_batch(groups, deadline)
+        if invalid:
+            batches = itertools.chain((([i], "error", {**error_result(e), "details": e.errors}) for i, e in invalid), batches)
+        for indexes, status, result in batches:
+            counts[status] = counts.get(status, 0) + len(indexes)
+            for i in indexes:
+                yield {"index": i, "status": status, "result": result}
+        yield {"total": len(layouts), "unique": len(groups), "status": counts,
+               "elapsed": round(time.monotonic() - started, 3)}
+
+    if request.args.get("stream"):
+        lines = (jsoncodec.dumps(r) + b"\n" for r in records())
+        return Response(lines, mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+    *items, summary = records()
+    return jsonify({"results": sorted(items, key=lambda r: r["index"]), **summary})
+
+
+# 串流事件名稱：陣列欄位每個元素一個事件，其餘欄位都是 metric
+STREAM_EVENTS = {"建議": "suggestion", "分析": "analysis"}
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {jsoncodec.dumps(data).decode('utf-8')}\n\n"
+
+
+def sse_field(name, value, is_item):
+    if is_item and name in STREAM_EVENTS:
+        return sse(STREAM_EVENTS[name], value)
+    return sse("metric", {"name": name, "value": value})
+
+
+def sse_result(text):
+    # 已經完整的結果（快取或本地分析）一樣拆成逐筆事件送出
+    for name, value in text.items():
+        if isinstance(value, list):
+            for v in value:
+                yield sse_field(name, v, True)
+        else:
+            yield sse_field(name, value, False)
+
+
+@app.route("/api/suggestions/stream", methods=["POST"])
+@rate_limited("suggestions")
+def api_suggestions_stream():
+    if recorder.replaying:
+        # 串流回應沒有錄製，重播時不能讓這條路由偷偷連到 Gemini
+        return jsonify({"error": "重播模式（GEMINI_RECORD=replay）不支援串流路由，請改用 /api/suggestions"}), 501
+    data = layout_body()
+    key = layout_key(data, model, PROMPT_VERSION)
+
+    def generate():
+        emitted = False
+        try:
+            text = suggestion_cache.get(key)
+            if SUGGESTION_ENGINE == "local":
+                text = analyze_layout(data)
+                yield from sse_result(text)
+                record_result(data, {**format_result(text), "engine": "local"}, key)
+            elif text is not None:
+                yield from sse_result(text)
+                record_result(data, format_result(text), key)
+            else:
+                parser = StructuredJsonStream()
+                deadline = time.monotonic() + GEMINI_DEADLINE
+                # 串流已送出的內容無法重來，所以只經過斷路器、不重試
+                with metrics.stage("stream", "build_prompt"):
+                    prompt = render_prompt(data)
+                chunk, started = None, time.monotonic()
+                try:
+                    with metrics.stage("stream", "gemini"), gemini_breaker.guard():
+                        for chunk in call_gemini_stream(prompt, model):
+                            for name, value, is_item in parser.feed(chunk.text or ""):
+                                emitted = True
+                                yield sse_field(name, value, is_item)
+                            if not parser.complete and time.monotonic() > deadline:
+                                raise DeadlineExceeded(f"Gemini 超過 {GEMINI_DEADLINE:g} 秒未完成")
+                except Exception as e:
+                    metrics.upstream_error(e)
+                    raise
+                # 最後一個 chunk 帶有整次請求的 usage_metadata
+                token_usage.record(chunk, "stream")
+                log_exchange(app.logger, key, prompt, jsoncodec.dumps(parser.result()).decode("utf-8"),
+                             time.monotonic() - started, "stream")
+                suggestion_cache.put(key, parser.result())
+                record_result(data, format_result(parser.result()), key)
+            yield sse("done", {})
+        except Exception as e:
+            if not is_upstream_failure(e):
+                app.logger.exception("Gemini API 發生錯誤")
+                yield sse("error", error_result(e))
+                return
+            app.logger.warning("Gemini 暫時無法使用（%s）", e)
+            if not emitted:
+                # 還沒送出任何內容：整份改用本地分析結果
+                yield from sse_result(analyze_layout(data))
+                record_result(data, degraded_result(data), key)
+            yield sse("done", {"degraded": True})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/analytics")
+@rate_limited("local")
+def api_analytics():
+    # 數據分析頁的圖表：只讀每日 / 每小時彙總表，?period=day|hour&count=時段數
+    period = request.args.get("period", "day")
+    if period not in analytics.PERIODS:
+        return jsonify({"error": "period 必須是 day 或 hour"}), 400
+    try:
+        count = int(request.args.get("count", "30"))
+    except ValueError:
+        return jsonify({"error": "count 必須是整數"}), 400
+    return jsonify(analytics.query(reader(), period, count))
+
+
+@app.before_request
+def track_request():
+    g.metrics_route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.metrics_started = time.perf_counter()
+    metrics.inflight.labels(g.metrics_route).inc()
+    g.trace_root, g.trace_token = tracing.start_trace(
+        f"{request.method} {g.metrics_route}", request.headers.get("traceparent"))
+
+
+@app.after_request
+def count_request(response):
+    metrics.requests_total.labels(g.metrics_route, response.status_code).inc()
+    if g.trace_root is not None:
+        g.trace_root.attributes["status"] = response.status_code
+        response.headers["X-Trace-Id"] = g.trace_root.trace.trace_id
+        response.headers["traceparent"] = tracing.traceparent(g.trace_root)
+    return response
+
+
+@app.teardown_request
+def finish_request(exc):
+    # 串流回應在內容送完後才會 teardown，耗時包含整段串流
+    if "metrics_route" in g:
+        metrics.inflight.labels(g.metrics_route).dec()
+        metrics.request_seconds.labels(g.metrics_route).observe(time.perf_counter() - g.metrics_started)
+        tracing.end_trace(g.trace_root, g.trace_token, exc)
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+
+@app.route("/api/traces")
+@rate_limited("local")
+def api_traces():
+    # 最近完成的 trace 依耗時排序：?min_ms=只列較慢的&limit=筆數
+    try:
+        min_ms = float(request.args.get("min_ms", "0"))
+        limit = int(request.args.get("limit", "20"))
+    except ValueError:
+        return jsonify({"error": "min_ms / limit 必須是數字"}), 400
+    return jsonify({"traces": tracing.exporter.recent(limit, min_ms)})
+
+
+@app.route("/api/traces/<trace_id>")
+@rate_limited("local")
+def api_trace(trace_id):
+    trace = tracing.exporter.get(trace_id)
+    if trace is None:
+        return jsonify({"error": "找不到這個 trace（可能已被較新的擠出緩衝區）"}), 404
+    return jsonify(trace)
+
+
+@app.route("/api/stats")
+def api_stats():
+    return jsonify({
+        "cache": suggestion_cache.stats(),
+        "singleflight": suggestion_flight.stats(),
+        "singleflight_async": suggestion_flight_async.stats(),
+        "gemini": {
+            "breaker": gemini_breaker.stats(),
+            "retries": retry_stats.stats(),
+            "tokens": token_usage.stats(),
+            "context_cache": context_cache.stats(),
+            "http": http_pool.stats(),
+            "recorder": recorder.stats(),
+        },
+        "jobs": job_queue.stats(),
+        "contributions": contributions.stats(),
+        "rate_limit": ratelimit.stats(),
+        "tracing": tracing.exporter.stats(),
+    })
 
 if __name__ == "__main__":
     app.run(host="127.0.0.1", port=5000, debug=True)
@@ -0,0 +1,147 @@
+"""ASGI 入口：/api/suggestions 走非同步管線（client.aio），其餘路由交給 Flask
+
+    uvicorn asgi:application
+    gunicorn -k uvicorn_worker.UvicornWorker asgi:application
+
+等待 Gemini 時不佔用執行緒，單一 worker 可同時掛著數百個上游請求。
+"""
+import concurrent.futures, os, time
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgiInstance
+from werkzeug.datastructures import Headers
+
+from app import app, rate_limited_body, suggest_async
+import jsoncodec
+import metrics
+from models import REQUEST_MAX_BYTES, InvalidRequest, parse_layout
+from ratelimit import RATE_LIMIT, RateLimited, client_id, limiters
+import tracing
+
+# 其餘 Flask 路由（串流、long-poll、批次、頁面）在自己的執行緒池跑。
+# WsgiToAsgi 預設 thread_sensitive：整個 worker 只有一條執行緒，請求互相排隊，並行串流時還會 500
+WSGI_THREADS = int(os.getenv("WSGI_THREADS", "32"))
+wsgi_pool = concurrent.futures.ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi")
+
+
+class WsgiInstance(WsgiToAsgiInstance):
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__["run_wsgi_app"].func,
+                                 thread_sensitive=False, executor=wsgi_pool)
+
+
+async def wsgi_app(scope, receive, send):
+    await WsgiInstance(app)(scope, receive, send)
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+async def read_body(receive, limit=REQUEST_MAX_BYTES):
+    chunks, size = [], 0
+    more = True
+    while more:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            # 超過上限就不再讀，也不把整個 body 放進記憶體
+            raise BodyTooLarge(f"請求超過 {limit} bytes 上限")
+        chunks.append(chunk)
+        more = message.get("more_body", False)
+    return b"".join(chunks)
+
+
+async def send_json(send, status, payload, headers=()):
+    with metrics.stage("async", "serialize"):
+        body = jsoncodec.dumps(payload)
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def scope_headers(scope):
+    return Headers([(k.decode("latin-1"), v.decode("latin-1")) for k, v in scope.get("headers", [])])
+
+
+def scope_client(scope):
+    return client_id(scope_headers(scope), (scope.get("client") or ("",))[0])
+
+
+async def api_suggestions(scope, receive, send):
+    # Flask 的 before/teardown_request 不會經過這條路由，指標在這裡自己記
+    route, started = "/api/suggestions", time.perf_counter()
+    metrics.inflight.labels(route).inc()
+    root, token = tracing.start_trace("POST " + route, scope_headers(scope).get("traceparent"))
+    extra = [] if root is None else [
+        (b"x-trace-id", root.trace.trace_id.encode("ascii")),
+        (b"traceparent", tracing.traceparent(root).encode("ascii")),
+    ]
+
+    async def traced_send(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": [*message["headers"], *extra]}
+        await send(message)
+
+    error = None
+    try:
+        status = await _api_suggestions(scope, receive, traced_send)
+        if root is not None:
+            root.attributes["status"] = status
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        metrics.inflight.labels(route).dec()
+        metrics.request_seconds.labels(route).observe(time.perf_counter() - started)
+        tracing.end_trace(root, token, error)
+    metrics.requests_total.labels(route, status).inc()
+
+
+async def _api_suggestions(scope, receive, send):
+    if RATE_LIMIT:
+        try:
+            await limiters["suggestions"].acquire_async(scope_client(scope))
+        except RateLimited as e:
+            await send_json(send, 429, rate_limited_body(e), [(b"retry-after", str(e.retry_after).encode("ascii"))])
+            return 429
+
+    try:
+        raw = await read_body(receive)
+        with metrics.stage("async", "parse_request"):
+            data = parse_layout(raw)
+    except BodyTooLarge as e:
+        await send_json(send, 413, {"error": str(e)})
+        return 413
+    except InvalidRequest as e:
+        await send_json(send, 400, {"error": str(e), "details": e.errors})
+        return 400
+
+    # 快取、呼叫 Gemini、降級與記錄結果都和 Flask 的 /api/suggestions 共用 app.suggest_async
+    body, status = await suggest_async(data)
+    await send_json(send, status, body)
+    return status
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] == "/api/suggestions":
+        return await api_suggestions(scope, receive, send)
+    await wsgi_app(scope, receive, send)
@@ -0,0 +1,54 @@
+"""氣流場模擬的效能測試：預設畫布（800×420）上放 1~8 台設備與數件傢俱
+
+    python bench/airflow_bench.py --repeat 20
+"""
+import argparse, math, os, statistics, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from airflow import simulate
+
+BUDGET_MS = 100
+
+
+def layout(devices):
+    items = [
+        {"type": "table", "kind": "furniture", "x": 308, "y": 187, "w": 90, "h": 60, "angle": 0},
+        {"type": "bed", "kind": "furniture", "x": 470, "y": 193, "w": 140, "h": 70, "angle": 0},
+        {"type": "sofa", "kind": "furniture", "x": 80, "y": 320, "w": 120, "h": 60, "angle": 0},
+        {"type": "desk", "kind": "furniture", "x": 620, "y": 40, "w": 110, "h": 60, "angle": 0},
+    ]
+    for i in range(devices):
+        kind = "ac" if i % 2 else "fan"
+        items.append({
+            "type": kind, "kind": kind,
+            "x": 40 + (i * 97) % 640, "y": 30 + (i * 53) % 330,
+            "w": 120 if kind == "ac" else 70, "h": 46 if kind == "ac" else 50,
+            "angle": (i % 8) * math.pi / 4,
+        })
+    return {"ac_temp": 26, "canvas_size": {"width": 800, "height": 420}, "items": items}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    worst = 0.0
+    for devices in (1, 2, 4, 8):
+        data = layout(devices)
+        simulate(data)  # 暖機
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = simulate(data)
+            times.append((time.perf_counter() - start) * 1000)
+        p50 = statistics.median(times)
+        worst = max(worst, max(times))
+        print(f"{devices} 台設備  p50 {p50:6.1f} ms  max {max(times):6.1f} ms  {result['metrics']}")
+    print(f"預算 {BUDGET_MS} ms：{'OK' if worst < BUDGET_MS else '超出'}")
+    return 0 if worst < BUDGET_MS else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
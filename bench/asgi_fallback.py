@@ -0,0 +1,68 @@
+"""asgi:application 交給 Flask 的路由能否並行：同時開幾條 /api/suggestions/stream，途中再打首頁
+
+    python bench/asgi_fallback.py
+    python bench/asgi_fallback.py --streams 8 --latency 3
+
+單一 UvicornWorker、假 Gemini 固定延遲。Flask 路由若在同一條執行緒排隊，
+串流會一條接一條跑完（上游最大並行 1），首頁要等所有串流結束；任一請求失敗或首頁等超過 1 秒時回傳非零。
+"""
+import argparse, asyncio, os, sys, time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_gemini import FakeGemini
+from load_e2e import free_port, payload, start_app, wait_ready
+
+
+async def stream(client, i):
+    started = time.perf_counter()
+    async with client.stream("POST", "/api/suggestions/stream", json=payload(i)) as r:
+        await r.aread()
+    return f"stream #{i}", r.status_code, time.perf_counter() - started
+
+
+async def index(client, delay):
+    await asyncio.sleep(delay)
+    started = time.perf_counter()
+    r = await client.get("/")
+    return "GET /", r.status_code, time.perf_counter() - started
+
+
+async def drive(url, streams, delay, timeout):
+    async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+        return await asyncio.gather(*(stream(client, i) for i in range(streams)), index(client, delay))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=3, help="同時開的串流數")
+    parser.add_argument("--latency", type=float, default=2.0, help="假 Gemini 的固定延遲秒數")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    fake = FakeGemini(latency=f"fixed:{args.latency}").start()
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    proc = start_app("async", fake.base_url, port, workers=1, threads=1)
+    try:
+        wait_ready(url)
+        # 首頁在串流都已經在等上游時才送出
+        rows = asyncio.run(drive(url, args.streams, args.latency / 4, args.timeout))
+    finally:
+        proc.terminate()
+        proc.wait()
+        fake.stop()
+
+    for label, status, seconds in rows:
+        print(f"{label:<12} {status:>4} {seconds * 1000:>9.1f} ms")
+    inflight = fake.stats()["max_inflight"]
+    print(f"上游最大並行：{inflight}")
+    ok = (all(status == 200 for _, status, _ in rows) and rows[-1][2] < 1.0 and inflight >= args.streams)
+    print("OK" if ok else "FAIL：Flask 路由沒有並行")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
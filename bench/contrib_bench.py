@@ -0,0 +1,66 @@
+"""匿名貢獻寫入的效能測試：多個執行緒同時 submit，量請求端延遲與 SQLite 實際寫入速度
+
+    python bench/contrib_bench.py --records 20000 --threads 8
+"""
+import argparse, os, statistics, sys, tempfile, threading, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from store import ContributionWriter
+
+RESULT = {
+    "suggestions": ["把桌子移開冷氣出風口"], "analysis": ["冷氣出風被桌子擋住"],
+    "metrics": {"舒適度評分": 7, "能耗指數": "中", "氣流效率": 6, "建議冷氣溫度": 26},
+}
+
+
+def layout(i):
+    return {
+        "ac_temp": 24 + i % 6, "room_template": "studio", "contribute": True,
+        "canvas_size": {"width": 800, "height": 420},
+        "items": [
+            {"type": "table", "kind": "furniture", "x": i % 700, "y": 187, "w": 90, "h": 60, "angle": 0},
+            {"type": "ac", "kind": "ac", "x": 40, "y": 30, "w": 120, "h": 46, "angle": 0},
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = ContributionWriter(os.path.join(tmp, "bench.db"), max_queue=args.records)
+        writer.start()
+        latencies = [[] for _ in range(args.threads)]
+
+        def produce(n):
+            for i in range(n, args.records, args.threads):
+                data = layout(i)
+                t = time.perf_counter()
+                writer.submit(data, RESULT)
+                latencies[n].append(time.perf_counter() - t)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=produce, args=(n,)) for n in range(args.threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        submitted = time.perf_counter() - start
+        writer.flush(timeout=120)
+        elapsed = time.perf_counter() - start
+
+        lat = sorted(x for per in latencies for x in per)
+        stats = writer.stats()
+        print(f"submit  p50 {statistics.median(lat) * 1e6:6.1f} µs  p99 {lat[int(len(lat) * 0.99)] * 1e6:6.1f} µs"
+              f"（{args.threads} 執行緒，{submitted:.2f} s 送完）")
+        print(f"寫入 {stats['written']} 筆 / {elapsed:.2f} s = {stats['written'] / elapsed:,.0f} 筆/s，"
+              f"{stats['batches']} 批，平均 {stats['avg_batch']} 筆，commit 平均 {stats['commit_avg_ms']} ms")
+        return 0 if stats["written"] == args.records else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
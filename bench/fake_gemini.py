@@ -0,0 +1,184 @@
+"""本機假的 Gemini HTTP API：generateContent / streamGenerateContent / models.get
+
+    python bench/fake_gemini.py --port 8090 --latency lognormal:0.8:0.4 --error-rate 0.05
+    GOOGLE_GEMINI_BASE_URL=http://127.0.0.1:8090/ API_KEY=x CONTEXT_CACHE=0 python app.py
+
+延遲分布：fixed:秒、uniform:最小:最大、lognormal:中位數:sigma；錯誤依 --error-rate 隨機回 429 / 500 / 503。
+回應是符合 app.schema 的固定 JSON（依佈局雜湊挑一組），附上 usageMetadata。
+"""
+import argparse, hashlib, json, math, random, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESULTS = [
+    {"分析": ["風扇前方有桌子阻擋，氣流無法到達床鋪"], "建議": ["移動桌子避免擋到風的流通", "冷氣溫度調高至 26°C"],
+     "能耗指數": "中", "舒適度評分": 6, "氣流效率": 5, "建議冷氣溫度": 26},
+    {"分析": ["冷氣出風口直吹床鋪", "風扇與冷氣方向一致，循環良好"], "建議": ["將床鋪移離出風口"],
+     "能耗指數": "低", "舒適度評分": 8, "氣流效率": 8, "建議冷氣溫度": 27},
+    {"分析": ["大型衣櫃擋住冷氣出風口"], "建議": ["衣櫃移到牆角", "加開風扇輔助循環", "冷氣溫度設定 26°C"],
+     "能耗指數": "高", "舒適度評分": 4, "氣流效率": 3, "建議冷氣溫度": 26},
+]
+
+ERRORS = {
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+}
+
+
+def parse_latency(spec):
+    """'fixed:0.5' / 'uniform:0.2:1' / 'lognormal:0.8:0.4' → 回傳一個取樣函式"""
+    kind, *args = spec.split(":")
+    args = [float(a) for a in args]
+    if kind == "fixed":
+        return lambda rng: args[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(args[0], args[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(args[0]), args[1])
+    raise ValueError(f"不支援的延遲分布：{spec}")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024   # 預設的 listen backlog 只有 5，高並行時會被拒絕連線
+
+
+class FakeGemini:
+    def __init__(self, host="127.0.0.1", port=0, latency="fixed:0.5", error_rate=0.0,
+                 error_codes=(429, 500, 503), seed=None):
+        self.configure(latency, error_rate, error_codes)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.inflight = 0
+        self.max_inflight = 0
+        handler = type("Handler", (_Handler,), {"fake": self})
+        self.server = _Server((host, port), handler)
+        self._thread = None
+
+    def configure(self, latency=None, error_rate=None, error_codes=None):
+        """執行中也可以換設定，同一個 app 依序跑多組情境"""
+        if latency is not None:
+            self.latency = latency
+            self._sample = parse_latency(latency)
+        if error_rate is not None:
+            self.error_rate = error_rate
+        if error_codes is not None:
+            self.error_codes = tuple(error_codes)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-gemini", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def draw(self):
+        """一次請求的 (延遲秒數, 錯誤狀態碼或 None)"""
+        with self._lock:
+            delay = max(0.0, self._sample(self._rng))
+            error = self._rng.choice(self.error_codes) if self._rng.random() < self.error_rate else None
+            self.requests += 1
+            self.errors += error is not None
+        return delay, error
+
+    def enter(self):
+        with self._lock:
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+
+    def leave(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors, "max_inflight": self.max_inflight}
+
+
+def generate_response(body):
+    prompt = json.dumps(body.get("contents"), ensure_ascii=False)
+    result = RESULTS[int(hashlib.md5(prompt.encode("utf-8")).hexdigest(), 16) % len(RESULTS)]
+    text = json.dumps(result, ensure_ascii=False)
+    prompt_tokens = max(1, len(prompt) // 3)
+    output_tokens = max(1, len(text) // 3)
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": output_tokens,
+                          "totalTokenCount": prompt_tokens + output_tokens},
+        "modelVersion": "fake-gemini",
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive，和真的 API 一樣重用連線
+    fake = None
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        # models.get（暖機用）
+        name = self.path.split("?")[0].split("/models/")[-1]
+        self.send_json(200, {"name": f"models/{name}", "displayName": name})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = self.path.split("?")[0]
+        if not (path.endswith(":generateContent") or path.endswith(":streamGenerateContent")):
+            return self.send_json(404, {"error": {"code": 404, "message": f"假伺服器不支援 {path}", "status": "NOT_FOUND"}})
+
+        delay, error = self.fake.draw()
+        self.fake.enter()
+        try:
+            time.sleep(delay)
+            if error is not None:
+                return self.send_json(error, {"error": {"code": error, "message": "fake error", "status": ERRORS.get(error, "UNKNOWN")}})
+            response = generate_response(body)
+            if path.endswith(":generateContent"):
+                return self.send_json(200, response)
+            # ?alt=sse：整份結果放在一個事件裡
+            data = f"data: {json.dumps(response, ensure_ascii=False)}\r\n\r\n".encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        finally:
+            self.fake.leave()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="lognormal:0.8:0.4", help="fixed:秒 / uniform:最小:最大 / lognormal:中位數:sigma")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    fake = FakeGemini(port=args.port, latency=args.latency, error_rate=args.error_rate, seed=args.seed)
+    print(f"假 Gemini：{fake.base_url}（延遲 {args.latency}，錯誤率 {args.error_rate:g}）")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""JSON 編解碼的 CPU 成本：標準庫（Flask 預設 provider、json.loads(response.text)）vs. jsoncodec + response.parsed
+
+    python bench/json_bench.py
+
+1. 各階段：批次請求的解碼、模型輸出的解析、回應的序列化，依佈局大小列出每次的微秒數
+2. 端對端：Flask test client 打 /api/suggestions 與 /api/suggestions/batch（結果預先放進快取，不呼叫 Gemini），
+   比較每個請求的 process CPU 時間（包含 batch_pool 執行緒）
+"""
+import json, os, sys, time, timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("API_KEY", "bench")
+os.environ.setdefault("CONTEXT_CACHE", "0")
+os.environ.setdefault("RATE_LIMIT", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from flask.json.provider import DefaultJSONProvider
+
+import app as coolspace
+import jsoncodec
+from layout_cache import layout_key, suggestion_cache
+from models import validate_layout
+
+ITEM = {"type": "table", "kind": "furniture", "x": 308, "y": 187, "w": 90, "h": 60, "angle": 0.785}
+# 模型輸出：建議與分析較長時的大小
+OUTPUT = {
+    "分析": [f"第 {i} 項：風扇前方有桌子阻擋，氣流無法到達床鋪，午後西曬讓窗邊溫度偏高" for i in range(12)],
+    "建議": [f"第 {i} 項：移動桌子避免擋到風的流通，冷氣溫度調高至 26°C" for i in range(12)],
+    "能耗指數": "中", "舒適度評分": 6, "氣流效率": 5, "建議冷氣溫度": 26,
+}
+
+
+def layout(n, seed=0):
+    return {
+        "ac_temp": 26, "room_template": f"bench-{seed}",
+        "canvas_size": {"width": 800, "height": 420},
+        "items": [{**ITEM, "x": 100 + i} for i in range(n)],
+    }
+
+
+def per_call(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def stages():
+    text = json.dumps(OUTPUT, ensure_ascii=False)
+    print(f"各階段（µs / 次，JSON_CODEC={jsoncodec.name}）")
+    print(f"{'階段':<28} {'標準庫':>10} {'新':>10} {'倍數':>6}")
+
+    def row(label, old, new, number):
+        a, b = per_call(old, number), per_call(new, number)
+        print(f"{label:<28} {a:>10.1f} {b:>10.1f} {a / b:>6.1f}")
+
+    # 模型輸出：SDK 依 response_schema 已經 json.loads 一次，原本又對 text 再解析一次
+    row("模型輸出解析", lambda: (json.loads(text), json.loads(text)), lambda: json.loads(text), 20000)
+    with coolspace.app.app_context():
+        flask_json = DefaultJSONProvider(coolspace.app)
+        fast_json = jsoncodec.FastJSONProvider(coolspace.app)
+        for n in (10, 50, 200):
+            body = {"layouts": [layout(n, i) for i in range(20)]}
+            raw = json.dumps(body).encode()
+            number = 200 if n >= 200 else 1000
+            row(f"批次請求解碼（20 × {n} 物件）", lambda: flask_json.loads(raw), lambda: fast_json.loads(raw), number)
+            results = {"results": [{"index": i, "status": "ok", "result": {**coolspace.format_result(OUTPUT), "layout": layout(n, i)}}
+                                   for i in range(20)]}
+            row(f"回應序列化（20 × {n} 物件）", lambda: flask_json.response(results), lambda: fast_json.response(results), number)
+
+
+def cpu_per_request(client, path, payload, number):
+    raw = json.dumps(payload).encode()
+    client.post(path, data=raw, content_type="application/json")
+    started = time.process_time()
+    for _ in range(number):
+        assert client.post(path, data=raw, content_type="application/json").status_code == 200
+    return (time.process_time() - started) / number * 1e6
+
+
+def end_to_end():
+    app = coolspace.app
+    client = app.test_client()
+    cases = [
+        ("/api/suggestions（200 物件）", "/api/suggestions", layout(200), 300),
+        ("batch（50 × 50 物件）", "/api/suggestions/batch", {"layouts": [layout(50, i) for i in range(50)]}, 30),
+        ("batch（200 × 20 物件）", "/api/suggestions/batch", {"layouts": [layout(20, i) for i in range(200)]}, 20),
+    ]
+    # 結果先放進快取：只量 JSON 與驗證、快取、組結果這些本地 CPU
+    for _, _, payload, _ in cases:
+        for data in payload.get("layouts", [payload]):
+            suggestion_cache.put(layout_key(validate_layout(data), coolspace.model, coolspace.PROMPT_VERSION), OUTPUT)
+    print("\n端對端（µs CPU / 請求）")
+    print(f"{'請求':<28} {'標準庫':>10} {'新':>10} {'節省':>7}")
+    for label, path, payload, number in cases:
+        # 兩種 provider 交替跑幾輪取最小值，減少雜訊
+        old = new = float("inf")
+        for _ in range(3):
+            app.json = DefaultJSONProvider(app)
+            old = min(old, cpu_per_request(client, path, payload, number))
+            app.json = jsoncodec.FastJSONProvider(app)
+            new = min(new, cpu_per_request(client, path, payload, number))
+        print(f"{label:<28} {old:>10.0f} {new:>10.0f} {1 - new / old:>7.0%}")
+
+
+if __name__ == "__main__":
+    stages()
+    end_to_end()
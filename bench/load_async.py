@@ -0,0 +1,115 @@
+"""比較同步（Flask + 執行緒）與非同步（ASGI + client.aio）單一 worker 的吞吐量
+
+    API_KEY=x python bench/load_async.py --latency 0.5 --requests 400 --threads 8
+
+Gemini 以固定延遲的假物件取代，不花額度；每個請求的佈局都不同，不會命中快取或被合併。
+"""
+import argparse, asyncio, contextlib, io, json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("API_KEY", "bench")
+os.environ.setdefault("CONTEXT_CACHE", "0")  # 不對真的 Gemini 建立快取
+os.environ.setdefault("RATE_LIMIT", "0")
+
+import app as server
+import asgi
+from gemini_client import get_client
+
+CANNED = json.dumps({
+    "分析": ["風扇前方有桌子阻擋"], "建議": ["移動桌子避免擋到風的流通"],
+    "能耗指數": "中", "舒適度評分": 7, "氣流效率": 6, "建議冷氣溫度": 26,
+}, ensure_ascii=False)
+
+
+class FakeResponse:
+    text = CANNED
+
+
+def install_fake(latency):
+    def generate_content(**kwargs):
+        time.sleep(latency)
+        return FakeResponse()
+
+    async def generate_content_async(**kwargs):
+        await asyncio.sleep(latency)
+        return FakeResponse()
+
+    client = get_client()
+    client.models.generate_content = generate_content
+    client.aio.models.generate_content = generate_content_async
+
+
+def payload(i):
+    return {
+        "ac_temp": 26, "room_template": f"bench-{i}",
+        "canvas_size": {"width": 800, "height": 420},
+        "items": [
+            {"type": "fan", "kind": "fan", "x": 184, "y": 173, "w": 70, "h": 50, "angle": 0},
+            {"type": "table", "kind": "furniture", "x": 308, "y": 187, "w": 90, "h": 60, "angle": 0},
+        ],
+    }
+
+
+def run_sync(n, threads, offset):
+    client = server.app.test_client()
+
+    def one(i):
+        return client.post("/api/suggestions", json=payload(offset + i)).status_code
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(threads) as pool:
+        codes = list(pool.map(one, range(n)))
+    return time.perf_counter() - start, codes
+
+
+async def asgi_post(body):
+    sent = []
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/api/suggestions", "headers": []}
+    await asgi.application(scope, receive, send)
+    return sent[0]["status"]
+
+
+async def run_async(n, concurrency, offset):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            return await asgi_post(json.dumps(payload(offset + i)).encode())
+
+    start = time.perf_counter()
+    codes = await asyncio.gather(*(one(i) for i in range(n)))
+    return time.perf_counter() - start, codes
+
+
+def report(name, n, elapsed, codes):
+    ok = sum(1 for c in codes if c == 200)
+    print(f"{name:<28} {n:>6} req  {elapsed:7.2f} s  {n / elapsed:8.1f} req/s  ok={ok}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.5, help="假 Gemini 的回應延遲（秒）")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=8, help="同步 worker 的執行緒數（gunicorn --threads）")
+    parser.add_argument("--concurrency", type=int, default=500, help="非同步 worker 同時處理的請求上限")
+    args = parser.parse_args()
+
+    install_fake(args.latency)
+    print(f"上游延遲 {args.latency}s，每種模式 {args.requests} 個不同佈局")
+    elapsed, codes = run_sync(args.requests, args.threads, 0)
+    report(f"sync  (threads={args.threads})", args.requests, elapsed, codes)
+    elapsed, codes = asyncio.run(run_async(args.requests, args.concurrency, args.requests))
+    report(f"async (concurrency={args.concurrency})", args.requests, elapsed, codes)
+
+
+if __name__ == "__main__":
+    main()
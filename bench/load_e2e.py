@@ -0,0 +1,172 @@
+"""端對端壓力測試：本機假 Gemini + 真的 gunicorn app，逐步提高並行數
+
+    python bench/load_e2e.py
+    python bench/load_e2e.py --mode sync --latency fixed:0.3,lognormal:0.8:0.5 --error-rate 0,0.05 \\
+        --concurrency 1,8,32,128 --requests 200 --json out.json
+
+app 以子行程啟動（GOOGLE_GEMINI_BASE_URL 指向假伺服器），走完整的 HTTP、SDK、連線池與重試路徑，
+不花額度也沒有網路雜訊。每個請求的佈局都不同，不會命中快取或被合併。
+每組（延遲分布 × 錯誤率 × 並行數）回報吞吐量、p50 / p95 / p99 延遲、HTTP 錯誤率與降級（本地結果）比例。
+"""
+import argparse, asyncio, json, os, socket, subprocess, sys, tempfile, time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_gemini import FakeGemini
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(mode, base_url, port, workers, threads):
+    env = {
+        **os.environ,
+        "GOOGLE_GEMINI_BASE_URL": base_url,
+        "API_KEY": "bench",
+        "CONTEXT_CACHE": "0",
+        "RATE_LIMIT": "0",
+        "GEMINI_WARMUP": "0",
+        "LOG_LEVEL": "WARNING",
+        "CONTRIB_DB": os.path.join(tempfile.mkdtemp(prefix="coolspace-bench-"), "bench.db"),
+        "WEB_CONCURRENCY": str(workers),
+        "BIND": f"127.0.0.1:{port}",
+    }
+    if mode == "async":
+        target = "asgi:application"
+    else:
+        env["GUNICORN_WORKER_CLASS"] = "gthread"
+        target = "app:app"
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--threads", str(threads), target],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url + "/api/stats", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("app 沒有在時間內啟動")
+
+
+def payload(i):
+    return {
+        "ac_temp": 26, "room_template": f"bench-{i}",
+        "canvas_size": {"width": 800, "height": 420},
+        "items": [
+            {"type": "fan", "kind": "fan", "x": 184, "y": 173, "w": 70, "h": 50, "angle": 0},
+            {"type": "table", "kind": "furniture", "x": 308, "y": 187, "w": 90, "h": 60, "angle": 0},
+            {"type": "bed", "kind": "furniture", "x": 470, "y": 193, "w": 140, "h": 70, "angle": 0},
+        ],
+    }
+
+
+async def drive(url, n, concurrency, offset, timeout):
+    """回傳 (總耗時, [(延遲秒數, 狀態碼, 是否降級)])"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with sem:
+                started = time.perf_counter()
+                try:
+                    r = await client.post("/api/suggestions", json=payload(offset + i))
+                    degraded = r.status_code == 200 and r.json().get("degraded") is True
+                    return time.perf_counter() - started, r.status_code, degraded
+                except httpx.HTTPError:
+                    return time.perf_counter() - started, 0, False
+
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(one(i) for i in range(n)))
+        return time.perf_counter() - started, samples
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))] if values else 0.0
+
+
+def summarize(latency, error_rate, concurrency, elapsed, samples):
+    times = [t for t, _, _ in samples]
+    n = len(samples)
+    return {
+        "latency": latency,
+        "error_rate": error_rate,
+        "concurrency": concurrency,
+        "requests": n,
+        "rps": round(n / elapsed, 1),
+        "p50_ms": round(percentile(times, 50) * 1000, 1),
+        "p95_ms": round(percentile(times, 95) * 1000, 1),
+        "p99_ms": round(percentile(times, 99) * 1000, 1),
+        "http_errors": round(sum(1 for _, s, _ in samples if s != 200) / n, 4),
+        "degraded": round(sum(1 for _, _, d in samples if d) / n, 4),
+    }
+
+
+def report(row):
+    print(f"{row['latency']:<20} {row['error_rate']:>5g} {row['concurrency']:>5} {row['rps']:>8.1f} "
+          f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} "
+          f"{row['http_errors']:>7.1%} {row['degraded']:>7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("async", "sync"), default="async",
+                        help="async：asgi + UvicornWorker；sync：app:app + gthread")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8, help="sync 模式每個 worker 的執行緒數")
+    parser.add_argument("--latency", default="fixed:0.3,lognormal:0.8:0.5", help="逗號分隔的延遲分布，見 fake_gemini.py")
+    parser.add_argument("--error-rate", default="0,0.05", help="逗號分隔的上游錯誤率")
+    parser.add_argument("--concurrency", default="1,8,32,128", help="逗號分隔的並行數")
+    parser.add_argument("--requests", type=int, default=200, help="每組的請求數")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="把結果寫成 JSON，方便比較修改前後")
+    args = parser.parse_args()
+
+    fake = FakeGemini(seed=args.seed).start()
+    port = free_port()
+    proc = start_app(args.mode, fake.base_url, port, args.workers, args.threads)
+    url = f"http://127.0.0.1:{port}"
+    rows, offset = [], 0
+    try:
+        wait_ready(url)
+        # 每個 worker 第一次呼叫時才載入 google.genai、建立連線，先跑幾個請求不計入結果
+        fake.configure(latency="fixed:0.01", error_rate=0.0)
+        offset = args.workers * 8
+        asyncio.run(drive(url, offset, args.workers * 4, 0, args.timeout))
+        print(f"mode={args.mode} workers={args.workers} 假 Gemini {fake.base_url}，每組 {args.requests} 個不同佈局")
+        print(f"{'latency':<20} {'err':>5} {'conc':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+              f"{'http_err':>7} {'degraded':>7}")
+        for latency in args.latency.split(","):
+            for error_rate in (float(e) for e in args.error_rate.split(",")):
+                fake.configure(latency=latency, error_rate=error_rate)
+                for concurrency in (int(c) for c in args.concurrency.split(",")):
+                    elapsed, samples = asyncio.run(drive(url, args.requests, concurrency, offset, args.timeout))
+                    offset += args.requests
+                    rows.append(summarize(latency, error_rate, concurrency, elapsed, samples))
+                    report(rows[-1])
+        print(f"假 Gemini：{fake.stats()}")
+    finally:
+        proc.terminate()
+        proc.wait(10)
+        fake.stop()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"mode": args.mode, "workers": args.workers, "results": rows}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""prompt 大小的回歸檢查：參考佈局（12 件物品）在沒有 context cache 時
+（system instruction + 佈局資料）超過 token 預算就回傳 1
+
+    python bench/prompt_budget.py            # 離線估算（CJK 每字 1 token，其餘約每 3 字元 1 token）
+    API_KEY=... python bench/prompt_budget.py --online   # 用 Gemini count_tokens 實測
+"""
+import argparse, math, os, re, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("API_KEY", "bench")
+
+import app as server
+from gemini_client import get_client
+from layout_codec import encode_items, normalize_items
+
+BUDGET_TOKENS = 700
+CJK = re.compile(r"[⺀-鿿豈-﫿＀-￯]")
+
+
+def estimate_tokens(text):
+    cjk = len(CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 3)
+
+
+def reference_layout():
+    items = [
+        {"type": "table", "kind": "furniture", "x": 308, "y": 187, "w": 90, "h": 60, "angle": 0},
+        {"type": "bed", "kind": "furniture", "x": 470.4, "y": 193.25, "w": 140, "h": 70, "angle": 0},
+        {"type": "sofa", "kind": "furniture", "x": 80, "y": 320, "w": 120, "h": 60, "angle": math.pi / 2},
+        {"type": "desk", "kind": "furniture", "x": 620, "y": 40, "w": 110, "h": 60, "angle": 0},
+    ]
+    for i in range(8):
+        kind = "ac" if i % 2 else "fan"
+        items.append({
+            "type": kind, "kind": kind,
+            "x": 40 + (i * 97) % 640, "y": 30 + (i * 53) % 330,
+            "w": 120 if kind == "ac" else 70, "h": 46 if kind == "ac" else 50,
+            "angle": (i % 8) * math.pi / 4,
+        })
+    return {"ac_temp": 26, "room_template": "1br", "canvas_size": {"width": 800, "height": 420}, "items": items}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--online", action="store_true")
+    args = parser.parse_args()
+
+    data = reference_layout()
+    prompt = server.render_prompt(data)
+    full = server.SYSTEM_INSTRUCTION + prompt
+    rows = normalize_items(data["items"])
+    if args.online:
+        count = lambda text: get_client().models.count_tokens(model=server.model, contents=text).total_tokens
+    else:
+        count = estimate_tokens
+    tokens = count(full)
+    print(f"物件清單：dict repr {estimate_tokens(repr(rows))} → 表格 {estimate_tokens(encode_items(rows))} tokens（估算）")
+    print(f"每個請求（命中 context cache）：{count(prompt)} tokens")
+    print(f"完整 prompt {len(full)} 字元，{tokens} tokens（{'count_tokens' if args.online else '估算'}），預算 {BUDGET_TOKENS}")
+    print("OK" if tokens <= BUDGET_TOKENS else "超出預算")
+    return 0 if tokens <= BUDGET_TOKENS else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
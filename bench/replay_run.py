@@ -0,0 +1,69 @@
+"""以錄到的真實流量重跑 /api/suggestions：不連網、結果固定，用來比較修改前後的效能
+
+    GEMINI_RECORD=record gunicorn -c gunicorn.conf.py asgi:application     # 先錄一段流量
+    python bench/replay_run.py --file recordings.jsonl --threads 8 --latency 1
+
+每筆錄製的原始請求照順序送進 app（GEMINI_RECORD=replay），回報吞吐量、延遲分位數，
+並檢查每個回應是否與錄製時的結果一致。
+"""
+import argparse, contextlib, io, json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", default="recordings.jsonl")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="重現錄製延遲的倍數（0 = 只量 app 本身）")
+    parser.add_argument("--repeat", type=int, default=1, help="整批重跑幾次（第二次起會命中快取）")
+    args = parser.parse_args()
+
+    os.environ.update(GEMINI_RECORD="replay", GEMINI_RECORD_FILE=args.file,
+                      GEMINI_REPLAY_LATENCY=str(args.latency))
+    os.environ.setdefault("API_KEY", "replay")
+    os.environ.setdefault("CONTEXT_CACHE", "0")
+    os.environ.setdefault("RATE_LIMIT", "0")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import app as server
+
+    entries = load(args.file)
+    server.warm_up()
+    client = server.app.test_client()
+
+    def one(entry):
+        started = time.perf_counter()
+        r = client.post("/api/suggestions", json=entry["request"])
+        elapsed = time.perf_counter() - started
+        expected = server.format_result(json.loads(entry["response"]["candidates"][0]["content"]["parts"][0]["text"]))
+        body = r.get_json()
+        return elapsed, r.status_code, r.status_code == 200 and body == expected
+
+    for run in range(args.repeat):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(args.threads) as pool:
+            samples = list(pool.map(one, entries))
+        elapsed = time.perf_counter() - started
+        times = [t for t, _, _ in samples]
+        ok = sum(1 for _, s, _ in samples if s == 200)
+        same = sum(1 for _, _, m in samples if m)
+        print(f"run {run + 1}: {len(samples)} req  {len(samples) / elapsed:8.1f} req/s  "
+              f"p50 {percentile(times, 50) * 1000:7.1f} ms  p95 {percentile(times, 95) * 1000:7.1f} ms  "
+              f"p99 {percentile(times, 99) * 1000:7.1f} ms  ok={ok}  與錄製相同={same}")
+    print(server.recorder.stats())
+
+
+if __name__ == "__main__":
+    main()
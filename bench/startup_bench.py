@@ -0,0 +1,76 @@
+"""worker 冷啟動的時間預算：import app（-X importtime）與第一個請求
+
+    python bench/startup_bench.py --repeat 5
+
+import app 超過預算，或在 import 階段就載入了 google.genai，回傳 1。
+"""
+import argparse, json, os, re, statistics, subprocess, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_MS = 500
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+COLD_START = """
+import json, sys, time
+t = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.app.test_client().post("/api/suggestions/local", json={"ac_temp": 26, "items": []})
+served = time.perf_counter()
+from gemini_client import get_client
+get_client()
+client = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - t) * 1000,
+    "first_request_ms": (served - imported) * 1000,
+    "client_ms": (client - served) * 1000,
+}))
+"""
+
+
+def run(args):
+    env = {**os.environ, "API_KEY": "bench", "CONTEXT_CACHE": "0", "LOG_LEVEL": "WARNING"}
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+
+def import_profile():
+    """-X importtime 的輸出 → app 直接 import 的模組 {模組: 累計微秒}"""
+    stderr = run(["-X", "importtime", "-c", "import app"]).stderr
+    children = {}
+    for self_us, cumulative_us, indent, name in LINE.findall(stderr):
+        # 子模組的紀錄在父模組之前；遇到頂層模組時，前面累積的就是它的直接子模組
+        if len(indent) == 1:
+            if name == "app":
+                return children, stderr
+            children = {}
+        elif len(indent) == 3:
+            children[name] = int(cumulative_us)
+    return children, stderr
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    top, stderr = import_profile()
+    genai_at_import = "google.genai" in stderr
+    print(f"import app 最慢的 {args.top} 個直接相依（-X importtime，累計）：")
+    for name, us in sorted(top.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    runs = [json.loads(run(["-c", COLD_START]).stdout) for _ in range(args.repeat)]
+    for field in ("import_ms", "first_request_ms", "client_ms"):
+        print(f"{field:18s} p50 {statistics.median(r[field] for r in runs):7.1f} ms")
+
+    import_ms = statistics.median(r["import_ms"] for r in runs)
+    ok = import_ms < IMPORT_BUDGET_MS and not genai_at_import
+    if genai_at_import:
+        print("google.genai 在 import 階段就被載入")
+    print(f"預算 {IMPORT_BUDGET_MS} ms：{'OK' if ok else '超出'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
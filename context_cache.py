@@ -0,0 +1,121 @@
+"""Gemini 明確快取（cached content）：固定的 system instruction 只上傳一次，請求只送佈局資料
+
+快取以 (model, prompt 版本) 為 key，在背景建立、在 TTL 到期前延長；
+還沒建好或建立失敗時，請求改為直接帶 system_instruction，不會因為快取而多等任何一次網路往返。
+建立被上游以 4xx 拒絕（例如內容低於模型的最小快取 token 數）時記住原因，這個 process 不再嘗試。
+"""
+import logging, threading, time
+
+from gemini_client import api_error_types
+
+log = logging.getLogger(__name__)
+
+
+class ContextCache:
+    def __init__(self, get_client, model, version, system_instruction, tool_config=None,
+                 ttl=3600, refresh_margin=300, retry_after=60, executor=None, enabled=True):
+        self.get_client = get_client
+        self.model = model
+        self.version = version
+        self.system_instruction = system_instruction
+        self.tool_config = tool_config
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self.executor = executor
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._name = None
+        self._expires_at = 0.0
+        self._retry_at = 0.0
+        self._refreshing = False
+        self.last_error = None
+        self.created = 0
+        self.refreshed = 0
+        self.failures = 0
+        self.hits = 0
+        self.inline = 0
+
+    @property
+    def display_name(self):
+        return f"coolspace-{self.model}-{self.version}"
+
+    def name(self):
+        """可用的快取名稱；沒有時回傳 None（呼叫端改用 inline system_instruction），需要時在背景建立/延長"""
+        now = time.monotonic()
+        with self._lock:
+            valid = self._name is not None and now < self._expires_at
+            stale = not valid or self._expires_at - now < self.refresh_margin
+            start = self.enabled and stale and not self._refreshing and now >= self._retry_at
+            if start:
+                self._refreshing = True
+            name = self._name if valid else None
+            if valid:
+                self.hits += 1
+            else:
+                self.inline += 1
+        if start:
+            if self.executor is not None:
+                self.executor.submit(self.refresh)
+            else:
+                threading.Thread(target=self.refresh, daemon=True).start()
+        return name
+
+    def refresh(self):
+        name = None
+        try:
+            with self._lock:
+                name = self._name if time.monotonic() < self._expires_at else None
+            ttl = f"{int(self.ttl)}s"
+            if name is not None:
+                self.get_client().caches.update(name=name, config={"ttl": ttl})
+                with self._lock:
+                    self._expires_at = time.monotonic() + self.ttl
+                    self.refreshed += 1
+                return
+            config = {"display_name": self.display_name, "system_instruction": self.system_instruction, "ttl": ttl}
+            if self.tool_config is not None:
+                config["tool_config"] = self.tool_config
+            cache = self.get_client().caches.create(model=self.model, config=config)
+            with self._lock:
+                self._name = cache.name
+                self._expires_at = time.monotonic() + self.ttl
+                self.created += 1
+                self.last_error = None
+            log.info("已建立 Gemini 快取 %s（%s）", cache.name, self.display_name)
+        except Exception as e:
+            # 建立時的 4xx（內容太短、模型不支援）在 prompt 改版前都不會變：停用快取，不再每個 TTL 重試；
+            # 其餘錯誤 retry_after 秒後再試
+            permanent = name is None and isinstance(e, api_error_types()) and 400 <= e.code < 500 and e.code != 429
+            with self._lock:
+                self.failures += 1
+                self.last_error = str(e)
+                self._retry_at = time.monotonic() + self.retry_after
+                if permanent:
+                    self.enabled = False
+                if name is not None:
+                    # 延長失敗：舊快取可能已被刪除，下一次改為重新建立
+                    self._name = None
+            if permanent:
+                log.warning("Gemini 拒絕建立快取 %s，停用 context cache、一律送完整 system instruction：%s",
+                            self.display_name, e)
+            else:
+                log.warning("Gemini 快取 %s 建立/延長失敗，暫時改送完整 system instruction：%s", self.display_name, e)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "enabled": self.enabled,
+                "name": self._name,
+                "expires_in": round(max(0.0, self._expires_at - now), 1) if self._name else None,
+                "created": self.created,
+                "refreshed": self.refreshed,
+                "failures": self.failures,
+                "hits": self.hits,
+                "inline": self.inline,
+                "last_error": self.last_error,
+            }
@@ -0,0 +1,120 @@
+"""冷氣耗電、電費與碳排估算（沿用早期 /analyze 的熱負荷模型）
+
+所有參數都可以是 NumPy 陣列並互相 broadcast，一次算完多個設定溫度 × 月份 × 情境。
+"""
+import numpy as np
+
+from engine import device_efficiency, to_number
+
+BASE_POWER_PER_M2 = 40     # 每平方公尺的冷氣基礎耗電（W），25 ㎡ ≈ 1000 W
+HOURS_PER_DAY = 8          # 平均每日使用時數
+DAYS_PER_MONTH = 30
+BLOCKED_PENALTY = 0.3      # 冷氣出風完全被擋住時多耗的比例
+FAN_POWER = 40             # 電風扇耗電（W）
+CO2_PER_KWH = 0.509        # 每度電的碳排（kg CO2e）
+
+ROOM_AREA = {"custom": 30, "studio": 25, "1br": 35, "2br": 50}   # ㎡，與 index.html 房型選單一致
+
+# 台電住宅用表燈非時間電價（每月度數級距，元/度）；夏月為 6–9 月
+TIER_LIMITS = np.array([120, 330, 500, 700, 1000, np.inf])
+TIER_RATES = np.array([
+    [1.68, 2.16, 3.03, 4.14, 5.07, 6.63],   # 非夏月
+    [1.68, 2.45, 3.70, 5.04, 6.24, 8.46],   # 夏月
+])
+SUMMER_MONTHS = (6, 7, 8, 9)
+
+
+def power_factor(ac_temp):
+    # 溫度影響因子：24°C 為 1，每調高 1°C 少 10%，最低 0.7
+    return np.maximum(0.7, 1 - (np.asarray(ac_temp, dtype=float) - 24) * 0.1)
+
+
+def is_summer(month):
+    return np.isin(np.asarray(month), SUMMER_MONTHS)
+
+
+def tiered_cost(kwh, summer):
+    """累進電價：kwh 與 summer 可為任意形狀的陣列（會 broadcast）"""
+    kwh = np.asarray(kwh, dtype=float)
+    lower = np.concatenate([[0.0], TIER_LIMITS[:-1]])
+    in_tier = np.clip(kwh[..., None] - lower, 0, TIER_LIMITS - lower)   # (..., tiers)
+    rates = TIER_RATES[np.asarray(summer, dtype=int)]                   # (..., tiers)
+    return (in_tier * rates).sum(-1)
+
+
+def monthly_kwh(ac_temp, area=30, fans=0, ac_efficiency=1.0, hours=HOURS_PER_DAY, days=DAYS_PER_MONTH, acs=1):
+    """冷氣（acs 台，0 = 沒有冷氣負載）加上電扇的每月耗電（度）；出風口被擋住時冷氣要多運轉，最多多耗 BLOCKED_PENALTY"""
+    ac_efficiency = np.clip(np.asarray(ac_efficiency, dtype=float), 0.0, 1.0)
+    layout_factor = 1 + BLOCKED_PENALTY * (1 - ac_efficiency)
+    ac_w = BASE_POWER_PER_M2 * np.asarray(area, dtype=float) * power_factor(ac_temp) * layout_factor * np.asarray(acs, dtype=float)
+    watts = ac_w + FAN_POWER * np.asarray(fans, dtype=float)
+    return watts * np.asarray(hours, dtype=float) * np.asarray(days, dtype=float) / 1000
+
+
+def estimate(ac_temp, month, area=30, fans=0, ac_efficiency=1.0,
+             hours=HOURS_PER_DAY, days=DAYS_PER_MONTH, other_kwh=0.0, acs=1):
+    """回傳 kwh / cost / co2_kg 陣列；cost 為冷氣造成的邊際電費（已扣掉家中其他用電 other_kwh 的部分）"""
+    kwh = monthly_kwh(ac_temp, area, fans, ac_efficiency, hours, days, acs)
+    kwh, summer = np.broadcast_arrays(kwh, is_summer(month))
+    other = np.asarray(other_kwh, dtype=float)
+    cost = tiered_cost(kwh + other, summer) - tiered_cost(other, summer)
+    return {
+        "kwh": kwh,
+        "cost": cost,
+        "co2_kg": kwh * CO2_PER_KWH,
+        "summer": summer,
+    }
+
+
+def layout_inputs(data):
+    """從畫布佈局取出估算需要的參數：房型面積、冷氣與電扇台數、冷氣遮擋後的效率"""
+    kinds, eff = device_efficiency(data.get("items"))
+    kinds = np.array(kinds)
+    ac_eff = float(eff[kinds == "ac"].mean()) if (kinds == "ac").any() else 1.0
+    return {
+        "area": ROOM_AREA.get(data.get("room_template"), ROOM_AREA["custom"]),
+        "acs": int((kinds == "ac").sum()),
+        "fans": int((kinds == "fan").sum()),
+        "ac_efficiency": ac_eff,
+    }
+
+
+def estimate_layout(data, setpoints=None, months=None, hours=HOURS_PER_DAY, other_kwh=0.0):
+    """佈局 × 設定溫度 × 月份的完整表格，形狀 (len(setpoints), len(months))"""
+    setpoints = np.asarray(setpoints if setpoints is not None else np.arange(20, 31), dtype=float)
+    months = np.asarray(months if months is not None else np.arange(1, 13), dtype=int)
+    inputs = layout_inputs(data)
+    grid = estimate(setpoints[:, None], months[None, :], hours=hours, other_kwh=other_kwh, **inputs)
+    current = estimate(to_number(data.get("ac_temp"), 26.0), months, hours=hours, other_kwh=other_kwh, **inputs)
+    return inputs, setpoints, months, grid, current
+
+
+def energy_payload(data):
+    """/api/energy 的回應：目前設定溫度每月的估算，加上設定溫度 × 月份的情境表"""
+    # 選項的型別與範圍已由 models.EnergyOptions 驗證（設定溫度最多 24 個、月份 1–12 不重複）
+    opts = data.get("energy") or {}
+    setpoints = list(opts.get("setpoints") or ()) or None
+    months = list(opts.get("months") or ()) or None
+    hours = to_number(opts.get("hours"), HOURS_PER_DAY)
+    other_kwh = to_number(opts.get("other_kwh"), 0.0)
+    inputs, setpoints, months, grid, current = estimate_layout(data, setpoints, months, hours, other_kwh)
+    r = lambda a, n=2: np.round(a, n).tolist()
+    # 沒有涵蓋整年時只是所選月份的合計，不能叫年電費
+    total = "annual_cost" if len(months) == 12 else "period_cost"
+    return {
+        "inputs": {**inputs, "ac_efficiency": round(inputs["ac_efficiency"], 3), "hours": hours, "other_kwh": other_kwh},
+        "months": months.tolist(),
+        "current": {
+            "ac_temp": to_number(data.get("ac_temp"), 26.0),
+            "kwh": r(current["kwh"]),
+            "cost": r(current["cost"], 0),
+            "co2_kg": r(current["co2_kg"]),
+            total: round(float(current["cost"].sum())),
+        },
+        "scenarios": {
+            "setpoints": setpoints.tolist(),
+            "kwh": r(grid["kwh"]),
+            "cost": r(grid["cost"], 0),
+            "co2_kg": r(grid["co2_kg"]),
+        },
+    }
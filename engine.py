@@ -0,0 +1,264 @@
+"""本地規則分析引擎：不呼叫 LLM，直接由畫布佈局算出與 schema 相同的欄位
+
+物件是可旋轉的矩形（x, y 為未旋轉時的左上角，angle 為弧度，繞中心旋轉），
+風扇/冷氣的出風口與出風錐參數跟 static/app.js 的 DEVICE_PRESET 一致。
+"""
+import math
+from collections.abc import Mapping
+import numpy as np
+
+# 與 static/app.js 的 FURN_PRESET / DEVICE_PRESET 同步
+FURN_SIZE = {
+    "sofa": (120, 60), "table": (90, 60), "bed": (140, 70),
+    "desk": (110, 60), "tv": (100, 40), "other": (60, 80),
+}
+DEVICE_PRESET = {
+    "fan": {"w": 70, "h": 50, "speed": 2.2, "spread_deg": 18},
+    "ac": {"w": 120, "h": 46, "speed": 2.8, "spread_deg": 12},
+}
+# 粒子平均速度倍率 × 平均壽命（幀），換算出風可及距離（px）
+REACH_FACTOR = 1.4 * 80
+DEFAULT_CANVAS = (800, 420)
+GRID = (32, 18)
+
+LABELS = {
+    "sofa": "沙發", "table": "桌子", "bed": "床鋪", "desk": "書桌",
+    "tv": "電視櫃", "other": "其他物體", "fan": "風扇", "ac": "冷氣",
+}
+# 畫布 y 軸朝下，角度 0 = 向右，每 45° 一格
+DIRECTIONS = ["右", "右下", "下", "左下", "左", "左上", "上", "右上"]
+# 有人會長時間停留、不宜被冷氣直吹的傢俱
+REST_TYPES = {"bed", "sofa"}
+
+
+def to_number(v, default=0.0):
+    try:
+        f = float(v)
+        return f if math.isfinite(f) else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _parse(items):
+    devices, furniture = [], []
+    for it in items or []:
+        if not isinstance(it, Mapping):
+            continue
+        kind = it.get("kind")
+        type_ = it.get("type") or kind
+        if kind in DEVICE_PRESET:
+            dw, dh = DEVICE_PRESET[kind]["w"], DEVICE_PRESET[kind]["h"]
+        else:
+            dw, dh = FURN_SIZE.get(type_, (60, 60))
+        w, h = to_number(it.get("w"), dw) or dw, to_number(it.get("h"), dh) or dh
+        row = (type_, kind, to_number(it.get("x")), to_number(it.get("y")), w, h, to_number(it.get("angle")))
+        (devices if kind in DEVICE_PRESET else furniture).append(row)
+    return devices, furniture
+
+
+def _label(type_):
+    return LABELS.get(type_, type_ or "物體")
+
+
+def _direction(angle):
+    return DIRECTIONS[round(angle / (math.pi / 4)) % 8]
+
+
+def _screen_direction(vx, vy):
+    if abs(vx) >= abs(vy):
+        return "右" if vx > 0 else "左"
+    return "下" if vy > 0 else "上"
+
+
+def _sample_points(furniture):
+    """每件傢俱取 4 角 + 4 邊中點 + 中心，形狀 (F, 9, 2)"""
+    if not furniture:
+        return np.zeros((0, 9, 2))
+    arr = np.array([f[2:] for f in furniture], dtype=float)
+    x, y, w, h, a = arr.T
+    ux = np.array([-1, 1, 1, -1, 0, 1, 0, -1, 0]) * 0.5
+    uy = np.array([-1, -1, 1, 1, -1, 0, 1, 0, 0]) * 0.5
+    lx, ly = ux[None] * w[:, None], uy[None] * h[:, None]
+    cos, sin = np.cos(a)[:, None], np.sin(a)[:, None]
+    px = (x + w / 2)[:, None] + lx * cos - ly * sin
+    py = (y + h / 2)[:, None] + lx * sin + ly * cos
+    return np.stack([px, py], axis=-1)
+
+
+def _device_geometry(devices):
+    arr = np.array([d[2:] for d in devices], dtype=float)
+    x, y, w, h, a = arr.T
+    d = np.stack([np.cos(a), np.sin(a)], axis=-1)
+    # 出風口：與前端 spawnParticlesFrom 相同，從中心推到前緣
+    outlet = np.stack([x + w / 2 + d[:, 0] * w / 2, y + h / 2 + d[:, 1] * h / 2], axis=-1)
+    half = np.radians([DEVICE_PRESET[dev[1]]["spread_deg"] for dev in devices])
+    reach = np.array([DEVICE_PRESET[dev[1]]["speed"] * REACH_FACTOR for dev in devices])
+    # 錐頂放在出風口後方，讓錐形剛好通過出風口兩端（寬度 = 設備短邊）
+    back = (np.minimum(w, h) / 2) / np.tan(half)
+    apex = outlet - d * back[:, None]
+    return d, apex, back, half, reach
+
+
+def _cone_coords(points, d, apex, back):
+    """points (..., 2) → 每個設備座標系下的 (距出風口距離, 相對出風方向的角度)，形狀 (D, ...)"""
+    shape = (len(d),) + (1,) * (points.ndim - 1) + (2,)
+    v = points[None] - apex.reshape(shape)
+    dd = d.reshape(shape)
+    along = (v * dd).sum(-1)
+    perp = v[..., 1] * dd[..., 0] - v[..., 0] * dd[..., 1]
+    theta = np.arctan2(perp, along)
+    return along - back.reshape(shape[:-1]), theta, along
+
+
+def _occlusion(pts, d, apex, back, half, reach):
+    """每台設備 × 每件傢俱的遮擋角度範圍、遮擋比例、最近距離，以及每台設備剩下的送風效率"""
+    dist, theta, raw_along = _cone_coords(pts, d, apex, back)   # (D, F, 9)
+    front = raw_along > 0
+    lo = np.where(front, theta, np.inf).min(-1)
+    hi = np.where(front, theta, -np.inf).max(-1)
+    h2 = half[:, None]
+    overlap = np.clip(np.minimum(hi, h2) - np.maximum(lo, -h2), 0, None)
+    frac = np.where(front.any(-1), overlap / (2 * h2), 0.0)
+    near = np.where(front, np.maximum(dist, 0), np.inf).min(-1)
+    blocked = (frac > 0) & (near < reach[:, None])
+    # 角度範圍完全落在更近的遮擋物後面的傢俱吹不到風，只算第一個擋住的
+    clo, chi = np.maximum(lo, -h2), np.minimum(hi, h2)
+    hidden = (blocked[:, :, None] & (near[:, :, None] < near[:, None, :])
+              & (clo[:, :, None] <= clo[:, None, :]) & (chi[:, None, :] <= chi[:, :, None])).any(1)
+    blocked &= ~hidden
+    # 越靠近出風口的遮擋影響越大
+    weight = 0.5 + 0.5 * np.clip(1 - near / reach[:, None], 0, 1)
+    eff = np.prod(np.where(blocked, 1 - frac * weight, 1.0), axis=1)
+    return lo, hi, frac, near, blocked, eff
+
+
+def device_efficiency(items):
+    """每台風扇/冷氣扣掉傢俱遮擋後的送風效率（0~1），回傳 (kinds, eff)"""
+    devices, furniture = _parse(items)
+    if not devices:
+        return [], np.zeros(0)
+    if not furniture:
+        return [dev[1] for dev in devices], np.ones(len(devices))
+    d, apex, back, half, reach = _device_geometry(devices)
+    eff = _occlusion(_sample_points(furniture), d, apex, back, half, reach)[-1]
+    return [dev[1] for dev in devices], eff
+
+
+def analyze_layout(data):
+    ac_temp = to_number(data.get("ac_temp"), 26.0)
+    canvas = data.get("canvas_size") or {}
+    cw = to_number(canvas.get("width"), DEFAULT_CANVAS[0]) if isinstance(canvas, Mapping) else DEFAULT_CANVAS[0]
+    ch = to_number(canvas.get("height"), DEFAULT_CANVAS[1]) if isinstance(canvas, Mapping) else DEFAULT_CANVAS[1]
+    cw, ch = cw or DEFAULT_CANVAS[0], ch or DEFAULT_CANVAS[1]
+
+    devices, furniture = _parse(data.get("items"))
+    analysis, suggestions = [], []
+    has_ac = any(dev[1] == "ac" for dev in devices)
+    has_fan = any(dev[1] == "fan" for dev in devices)
+
+    blocks = []          # (device idx, furniture idx, 距離, 遮擋比例)
+    direct_rest = []     # 冷氣直吹的床鋪/沙發
+    ac_eff, fan_eff = 1.0, 0.0
+    coverage = 0.0
+    airflow = 2
+
+    if devices:
+        d, apex, back, half, reach = _device_geometry(devices)
+        eff = np.ones(len(devices))
+
+        if furniture:
+            pts = _sample_points(furniture)
+            lo, hi, frac, near, blocked, eff = _occlusion(pts, d, apex, back, half, reach)
+            for i, j in zip(*np.nonzero(blocked)):
+                blocks.append((i, j, float(near[i, j]), float(frac[i, j])))
+                if devices[i][1] == "ac" and furniture[j][0] in REST_TYPES and near[i, j] < reach[i] * 0.6:
+                    direct_rest.append((i, j))
+
+        # 房間網格：在任一出風錐內、且沒有被更近的傢俱擋住，就算有氣流覆蓋
+        gx = (np.arange(GRID[0]) + 0.5) * cw / GRID[0]
+        gy = (np.arange(GRID[1]) + 0.5) * ch / GRID[1]
+        grid = np.stack(np.meshgrid(gx, gy), axis=-1).reshape(-1, 2)
+        gdist, gtheta, graw = _cone_coords(grid, d, apex, back)       # (D, G)
+        reached = (graw > 0) & (gdist < reach[:, None]) & (np.abs(gtheta) <= half[:, None])
+        for i, j, near_ij, _ in blocks:
+            shadow = (gtheta[i] >= lo[i, j]) & (gtheta[i] <= hi[i, j]) & (gdist[i] > near_ij)
+            reached[i] &= ~shadow
+        coverage = float(reached.any(0).mean())
+
+        kinds = np.array([dev[1] for dev in devices])
+        ac_eff = float(eff[kinds == "ac"].mean()) if has_ac else 1.0
+        fan_eff = float(eff[kinds == "fan"].mean()) if has_fan else 0.0
+        raw = 0.6 * float(eff.mean()) + 0.4 * min(1.0, coverage / 0.2)
+        airflow = int(min(10, max(1, round(1 + 9 * raw))))
+
+        for i, dev in enumerate(devices):
+            analysis.append(f"{_label(dev[0])}朝{_direction(dev[6])}出風，有效送風距離約 {reach[i]:.0f} px。")
+        analysis.append(f"出風大約涵蓋 {coverage * 100:.0f}% 的空間。")
+
+        for i, j, near_ij, frac_ij in blocks:
+            dev, furn = devices[i], furniture[j]
+            analysis.append(
+                f"{_label(furn[0])}位於{_label(dev[0])}前方約 {near_ij:.0f} px，擋住約 {frac_ij * 100:.0f}% 的出風範圍。")
+            # 往傢俱中心所在的那一側推出出風錐
+            center = pts[j, 8]
+            v = center - apex[i]
+            side = 1.0 if (v[1] * d[i, 0] - v[0] * d[i, 1]) >= 0 else -1.0
+            normal = np.array([-d[i, 1], d[i, 0]]) * side
+            cone_half = (near_ij + back[i]) * math.tan(half[i])
+            extent = np.abs((pts[j] - center) @ normal).max()
+            shift = max(10, math.ceil((cone_half + extent - abs(float(v @ normal))) / 10) * 10)
+            suggestions.append(
+                f"將{_label(furn[0])}往{_screen_direction(*normal)}移動約 {shift} px，"
+                f"或把{_label(dev[0])}轉向避開{_label(furn[0])}，讓氣流順暢。")
+        if not blocks:
+            analysis.append("出風路徑上沒有傢俱阻擋，氣流順暢。")
+
+        for i, j in direct_rest:
+            analysis.append(f"{_label(devices[i][0])}直吹{_label(furniture[j][0])}，長時間停留容易著涼。")
+            suggestions.append(f"調整{_label(devices[i][0])}出風方向，避免直吹{_label(furniture[j][0])}。")
+
+        if coverage < 0.06:
+            suggestions.append("出風覆蓋範圍偏小，可點擊風扇或冷氣旋轉 45°，讓出風朝向房間中央。")
+        if has_ac and not has_fan:
+            suggestions.append("加一台風扇順著冷氣出風方向循環，冷空氣分布更均勻，體感可再降 1–2°C。")
+    else:
+        analysis.append("畫布上沒有風扇或冷氣，室內空氣主要靠自然對流。")
+        suggestions.append("加入冷氣或風扇，並讓出風口朝向主要活動區域。")
+
+    # 建議溫度：26°C 起跳，風扇循環有效時可再調高
+    rec = 26
+    if has_fan and fan_eff > 0.6:
+        rec += 1
+        if airflow >= 8:
+            rec += 1
+
+    # 畫布上沒有冷氣時，設定溫度只是表單預設值，不評論也不建議調整
+    if has_ac:
+        if ac_temp < 25:
+            analysis.append(f"冷氣設定 {ac_temp:g}°C 偏低，壓縮機負載高、耗電量大。")
+        elif ac_temp > 28:
+            analysis.append(f"冷氣設定 {ac_temp:g}°C 偏高，台灣夏季濕熱時可能不夠舒適。")
+        else:
+            analysis.append(f"冷氣設定 {ac_temp:g}°C，在節能與舒適之間屬於合理範圍。")
+        if ac_temp < rec:
+            suggestions.append(f"冷氣溫度可由 {ac_temp:g}°C 調高至 {rec}°C，每調高 1°C 約可省 6% 電。")
+
+    if has_ac:
+        load = (27 - ac_temp) + 1.5 * (1 - ac_eff) - (0.5 if fan_eff > 0.6 else 0)
+        energy = "高" if load >= 2.5 else "中" if load >= 0.5 else "低"
+        comfort = 8 - 0.8 * abs(ac_temp - 26) + 0.3 * (airflow - 5) - (1 if direct_rest else 0)
+    else:
+        # 沒有冷氣：耗電只來自電扇（每台約 40 W），舒適度只看氣流，與表單的設定溫度無關
+        fans = sum(dev[1] == "fan" for dev in devices)
+        energy = "中" if fans > 3 else "低"
+        comfort = 5 + 0.3 * (airflow - 5)
+    comfort = int(min(10, max(1, round(comfort))))
+
+    return {
+        "分析": analysis,
+        "建議": suggestions,
+        "能耗指數": energy,
+        "舒適度評分": comfort,
+        "氣流效率": airflow,
+        "建議冷氣溫度": rec,
+    }
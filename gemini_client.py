@@ -0,0 +1,43 @@
+"""每個 worker process 各自延遲建立的 Gemini client
+
+google.genai 光是 import 就要數百毫秒，所以直到第一次呼叫 get_client() 才載入；
+fork 之後（gunicorn preload）pid 改變會重新建立，不與 master 共用連線。
+"""
+import logging, os, sys, threading, time
+
+from http_pool import http_options
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_client = None
+_pid = None
+
+
+def get_client():
+    global _client, _pid
+    if _client is None or _pid != os.getpid():
+        with _lock:
+            if _client is None or _pid != os.getpid():
+                from google import genai
+                _client = genai.Client(api_key=os.getenv("API_KEY"), http_options=http_options())
+                _pid = os.getpid()
+    return _client
+
+
+def api_error_types():
+    """google.genai 還沒載入時不可能有它的例外，回傳空 tuple 讓 isinstance 直接為 False"""
+    errors = sys.modules.get("google.genai.errors")
+    return (errors.APIError,) if errors else ()
+
+
+def warm_up(model, timeout=5.0):
+    """建立 client 並以一次輕量的 models.get 打開 TLS 連線，讓第一個使用者請求不必等握手"""
+    started = time.monotonic()
+    try:
+        get_client().models.get(model=model, config={"http_options": {"timeout": int(timeout * 1000)}})
+    except Exception as e:
+        log.warning("Gemini 暖機失敗（%s），第一個請求時再建立連線", e)
+        return False
+    log.info("Gemini client 暖機完成（%.0f ms）", (time.monotonic() - started) * 1000)
+    return True
@@ -0,0 +1,38 @@
+# gunicorn -c gunicorn.conf.py asgi:application
+import glob, os, tempfile, threading
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "uvicorn_worker.UvicornWorker")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+bind = os.getenv("BIND", "0.0.0.0:8000")
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+
+# /metrics 要彙總所有 worker：prometheus_client 在 worker 載入 app 前就要看到這個目錄
+if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="coolspace-metrics-")
+
+
+def on_starting(server):
+    # 沿用指定的目錄時，清掉上次執行留下的數值
+    for path in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+        os.remove(path)
+
+
+def _warm_up():
+    import app
+    app.warm_up()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        # master 裡啟動的日誌 listener 執行緒不會跟著 fork，重新啟動一個
+        import logpipe
+        logpipe.setup_logging()
+    if os.getenv("GEMINI_WARMUP", "1") == "1":
+        # 背景暖機，不延後 worker 開始接請求
+        threading.Thread(target=_warm_up, name="gemini-warmup", daemon=True).start()
+
+
+def child_exit(server, worker):
+    # 結束的 worker 的 gauge 不再計入（counter / histogram 保留）
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
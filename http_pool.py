@@ -0,0 +1,172 @@
+"""Gemini 用的共用 HTTP 連線池：明確的連線上限、keep-alive、可用時走 HTTP/2
+
+genai SDK 以 client_args / async_client_args 把 transport 交給 httpx；整個 process 共用一個 client，
+httpx 的連線池本身就是 thread-safe。transport 透過 httpcore 的 trace 擴充記錄：
+等待連線的時間、新建連線 / 重用連線、TLS 握手次數。
+"""
+import importlib.util, os, ssl, threading, time
+
+import certifi
+import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "64"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "32"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "90"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "10"))
+# auto：有安裝 h2 才開 HTTP/2；1 / 0 強制開關
+HTTP2 = os.getenv("HTTP2", "auto")
+
+
+def http2_enabled():
+    if HTTP2 == "auto":
+        return importlib.util.find_spec("h2") is not None
+    return HTTP2 == "1"
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.reused = 0
+        self.tls_handshakes = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait, connected, tls):
+        with self._lock:
+            self.requests += 1
+            if connected:
+                self.new_connections += 1
+            else:
+                self.reused += 1
+            self.tls_handshakes += tls
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused": self.reused,
+                "reuse_ratio": round(self.reused / self.requests, 4) if self.requests else None,
+                "tls_handshakes": self.tls_handshakes,
+                "pool_wait_avg_ms": round(self.wait_total / self.requests * 1000, 2) if self.requests else 0.0,
+                "pool_wait_max_ms": round(self.wait_max * 1000, 2),
+            }
+
+
+class _Probe:
+    """單一請求的 trace：第一次建 TCP 或送出 header 之前的時間都算在等待連線池"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wait = None
+        self.connected = False
+        self.tls = 0
+
+    def event(self, name):
+        if name == "connection.connect_tcp.started":
+            self.connected = True
+        elif name == "connection.start_tls.complete":
+            self.tls += 1
+        if self.wait is None and (name == "connection.connect_tcp.started" or name.endswith("send_request_headers.started")):
+            self.wait = time.perf_counter() - self.started
+
+    def done(self, stats):
+        wait = self.wait if self.wait is not None else time.perf_counter() - self.started
+        stats.record(wait, self.connected, self.tls)
+
+
+def _prepare(request, trace):
+    # SDK 每次呼叫都會傳自己的 timeout（沒設定時是 None＝不限時），連線與排隊等待另外加上限
+    timeout = dict(request.extensions.get("timeout") or {})
+    for phase, limit in (("connect", HTTP_CONNECT_TIMEOUT), ("pool", HTTP_POOL_TIMEOUT)):
+        timeout[phase] = limit if timeout.get(phase) is None else min(timeout[phase], limit)
+    request.extensions = {**request.extensions, "timeout": timeout, "trace": trace}
+
+
+class PooledTransport(httpx.HTTPTransport):
+    def __init__(self, stats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request):
+        probe = _Probe()
+        _prepare(request, lambda name, info: probe.event(name))
+        try:
+            return super().handle_request(request)
+        finally:
+            probe.done(self.stats)
+
+    def pool_state(self):
+        conns = list(self._pool.connections)
+        return {"open": len(conns), "idle": sum(c.is_idle() for c in conns)}
+
+
+class AsyncPooledTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, stats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request):
+        probe = _Probe()
+
+        async def trace(name, info):
+            probe.event(name)
+
+        _prepare(request, trace)
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            probe.done(self.stats)
+
+    def pool_state(self):
+        conns = list(self._pool.connections)
+        return {"open": len(conns), "idle": sum(c.is_idle() for c in conns)}
+
+
+sync_stats = PoolStats()
+async_stats = PoolStats()
+_transports = {}
+
+
+def _ssl_context():
+    # 與 genai SDK 預設相同：尊重 SSL_CERT_FILE / SSL_CERT_DIR
+    return ssl.create_default_context(
+        cafile=os.environ.get("SSL_CERT_FILE", certifi.where()),
+        capath=os.environ.get("SSL_CERT_DIR"),
+    )
+
+
+def http_options():
+    """給 genai.Client 的 http_options；每次呼叫建立新的一組 transport（每個 process 一次）"""
+    kwargs = dict(
+        verify=_ssl_context(),
+        http2=http2_enabled(),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+    _transports["sync"] = PooledTransport(sync_stats, **kwargs)
+    _transports["async"] = AsyncPooledTransport(async_stats, **kwargs)
+    return {
+        "client_args": {"transport": _transports["sync"]},
+        "async_client_args": {"transport": _transports["async"]},
+    }
+
+
+def stats():
+    out = {
+        "http2": http2_enabled(),
+        "limits": {"max_connections": HTTP_MAX_CONNECTIONS, "max_keepalive": HTTP_MAX_KEEPALIVE},
+        "sync": sync_stats.stats(),
+        "async": async_stats.stats(),
+    }
+    for name, transport in _transports.items():
+        out[name]["pool"] = transport.pool_state()
+    return out
@@ -0,0 +1,131 @@
+"""非同步工作：POST 立刻拿到 job id，固定大小的 worker pool 在背景執行，GET 以 long-poll 取結果
+
+排隊中與執行中的工作放在一般 dict，完成（或失敗）後才移進 TTL 快取、從完成時間起保留 ttl 秒；
+排隊數達上限時拒絕新的工作。
+"""
+import concurrent.futures, threading, time, uuid
+
+from cachetools import TTLCache
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class JobFailed(Exception):
+    """工作失敗但有要回給用戶端的內容（例如與同步 API 相同格式的錯誤結果）"""
+
+    def __init__(self, result):
+        super().__init__(result.get("error", "工作失敗"))
+        self.result = result
+
+
+class Job:
+    __slots__ = ("id", "status", "created", "started", "finished", "result", "done")
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        body = {"id": self.id, "status": self.status, "created": round(self.created, 3)}
+        if self.started:
+            body["queued_ms"] = round((self.started - self.created) * 1000, 1)
+        if self.finished:
+            body["run_ms"] = round((self.finished - self.started) * 1000, 1)
+            body["result"] = self.result
+        return body
+
+
+class JobQueue:
+    def __init__(self, workers=8, max_queue=256, ttl=600, max_jobs=10000):
+        self.max_queue = max_queue
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.workers = workers
+        self._pending = {}   # 排隊中 / 執行中，不會過期
+        self._jobs = TTLCache(maxsize=max_jobs, ttl=ttl)   # 已完成
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+
+    def submit(self, fn, *args):
+        """fn 回傳要給用戶端的結果；丟出例外時狀態為 error"""
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull(f"工作佇列已滿（{self.max_queue}）")
+            job = Job()
+            self._pending[job.id] = job
+            self.queued += 1
+            self.submitted += 1
+        self._pool.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job, fn, args):
+        job.started = time.time()
+        wait = job.started - job.created
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+        job.status = "running"
+        try:
+            job.result = fn(*args)
+            job.status = "done"
+        except JobFailed as e:
+            job.result = e.result
+            job.status = "error"
+        except Exception as e:
+            job.result = {"error": str(e)}
+            job.status = "error"
+        job.finished = time.time()
+        with self._lock:
+            self.running -= 1
+            self.run_total += job.finished - job.started
+            if job.status == "done":
+                self.completed += 1
+            else:
+                self.failed += 1
+            # 從完成時間開始計算 TTL
+            del self._pending[job.id]
+            self._jobs[job.id] = job
+        job.done.set()
+
+    def get(self, job_id, wait=0.0):
+        """找不到（或已過期）回傳 None；wait > 0 時等到完成或逾時（long-poll）"""
+        with self._lock:
+            job = self._pending.get(job_id) or self._jobs.get(job_id)
+        if job is not None and wait > 0:
+            job.done.wait(wait)
+        return job
+
+    def stats(self):
+        with self._lock:
+            started = self.submitted - self.queued
+            finished = self.completed + self.failed
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queued,
+                "running": self.running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "stored": len(self._pending) + len(self._jobs),
+                "wait_avg_ms": round(self.wait_total / started * 1000, 1) if started else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 1),
+                "run_avg_ms": round(self.run_total / finished * 1000, 1) if finished else 0.0,
+            }
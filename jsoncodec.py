@@ -0,0 +1,71 @@
+"""請求 / 回應 body 的 JSON 編解碼
+
+JSON_CODEC=auto（預設）：有裝 orjson 就用，否則退回標準庫；也可以指定 orjson / stdlib。
+orjson 直接輸出 UTF-8 bytes、本身就能處理 dataclass（models.Layout），大佈局的編解碼快好幾倍。
+FastJSONProvider 接到 Flask 上，jsonify 與 request.get_json 都會經過這裡。
+"""
+import json, os
+from collections.abc import Mapping
+
+from flask.json.provider import DefaultJSONProvider
+
+JSON_CODEC = os.getenv("JSON_CODEC", "auto")   # auto / orjson / stdlib
+
+orjson = None
+if JSON_CODEC != "stdlib":
+    try:
+        import orjson
+    except ImportError:
+        if JSON_CODEC == "orjson":
+            raise
+
+name = "orjson" if orjson is not None else "stdlib"
+
+
+def _default(obj):
+    # 標準庫不認得 Mapping（models.Layout / Item）
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"無法序列化 {type(obj).__name__}")
+
+
+def dumps(obj, sort_keys=False, default=_default):
+    """物件 → 精簡的 UTF-8 JSON bytes"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=default, option=option)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys,
+                      default=default).encode("utf-8")
+
+
+def loads(s):
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask 的 JSON provider；要縮排輸出（debug 模式）或帶了額外參數時交回 Flask 預設實作"""
+    ensure_ascii = False
+    sort_keys = False   # 保留欄位原本的順序，與 asgi.py 的輸出一致
+
+    def _default(self, obj):
+        if isinstance(obj, Mapping):
+            return dict(obj)
+        return self.default(obj)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, self.sort_keys, self._default).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, self.sort_keys, self._default) + b"\n", mimetype=self.mimetype)
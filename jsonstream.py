@@ -0,0 +1,96 @@
+import json
+
+
+class StructuredJsonStream:
+    """逐段解析 Gemini 串流輸出的 JSON 物件
+
+    每當頂層陣列欄位（例如「建議」）多了一個完整元素，或頂層純量欄位（例如「舒適度評分」）
+    寫完，就回傳 (欄位名稱, 值, 是否為陣列元素)，不必等整份 JSON 產生完畢。
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._key_start = None
+        self._key = None
+        self._value_start = None   # 頂層欄位值的起點（':' 之後）
+        self._is_array = False
+        self._item_start = None    # 陣列元素的起點
+        self.complete = False      # 頂層物件是否已經結束
+
+    def feed(self, chunk):
+        self._text += chunk
+        text = self._text
+        events = []
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            depth = len(self._stack)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = json.loads(text[self._key_start:i + 1])
+                        self._key_start = None
+                continue
+
+            if c == '"':
+                self._in_string = True
+                if depth == 1 and self._expect_key:
+                    self._key_start = i
+            elif c in "{[":
+                if depth == 0 and c == "{":
+                    self._expect_key = True
+                elif depth == 1 and self._value_start is not None and c == "[" \
+                        and not text[self._value_start:i].strip():
+                    self._is_array = True
+                    self._item_start = i + 1
+                self._stack.append(c)
+            elif c in "}]":
+                if depth == 2 and self._is_array and c == "]":
+                    self._emit_item(events, i)
+                    self._item_start = None
+                elif depth == 1 and c == "}":
+                    self._emit_field(events, i)
+                    self.complete = True
+                if self._stack:
+                    self._stack.pop()
+            elif c == ":" and depth == 1:
+                self._expect_key = False
+                self._value_start = i + 1
+            elif c == ",":
+                if depth == 1:
+                    self._emit_field(events, i)
+                    self._expect_key = True
+                elif depth == 2 and self._is_array:
+                    self._emit_item(events, i)
+                    self._item_start = i + 1
+        self._pos = len(text)
+        return events
+
+    def _emit_item(self, events, end):
+        raw = self._text[self._item_start:end].strip()
+        if raw:
+            events.append((self._key, json.loads(raw), True))
+
+    def _emit_field(self, events, end):
+        if self._value_start is None:
+            return
+        if not self._is_array:
+            raw = self._text[self._value_start:end].strip()
+            if raw:
+                events.append((self._key, json.loads(raw), False))
+        self._value_start = None
+        self._is_array = False
+
+    def result(self):
+        # 串流結束後取得完整物件（寫入快取用）
+        return json.loads(self._text)
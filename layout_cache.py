@@ -0,0 +1,119 @@
+import hashlib, json, math, os, threading
+from collections.abc import Mapping
+from cachetools import TTLCache
+
+from metrics import cache_lookup
+
+# 前端點擊一次旋轉 45°，角度只會落在這些刻度上
+ANGLE_STEP = math.pi / 4
+# 正規化座標保留的小數位數（0.01 = 畫布的 1%）
+COORD_PRECISION = 2
+
+
+def _ratio(v, size):
+    try:
+        return round(float(v or 0) / size, COORD_PRECISION)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _scalar(v):
+    # 26、26.0、"26" 視為同一個溫度
+    try:
+        f = round(float(v), 1)
+        return int(f) if f.is_integer() else f
+    except (TypeError, ValueError):
+        return v
+
+
+def canonical_layout(data):
+    """把請求轉成與解析度無關的標準形式：座標除以畫布尺寸、角度取 45° 刻度、物件依類型排序"""
+    canvas = data.get("canvas_size") or {}
+    try:
+        cw = float(canvas.get("width") or 0) or 1.0
+        ch = float(canvas.get("height") or 0) or 1.0
+    except (TypeError, ValueError, AttributeError):
+        cw = ch = 1.0
+
+    items = []
+    for it in data.get("items") or []:
+        if not isinstance(it, Mapping):
+            continue
+        try:
+            step = round(float(it.get("angle") or 0) / ANGLE_STEP) % 8
+        except (TypeError, ValueError):
+            step = 0
+        items.append([
+            str(it.get("type") or ""), str(it.get("kind") or ""),
+            _ratio(it.get("x"), cw), _ratio(it.get("y"), ch),
+            _ratio(it.get("w"), cw), _ratio(it.get("h"), ch),
+            step,
+        ])
+    items.sort()
+
+    return {
+        "ac_temp": _scalar(data.get("ac_temp")),
+        "room_template": data.get("room_template"),
+        "items": items,
+    }
+
+
+def layout_key(data, model, prompt_version):
+    payload = [prompt_version, model, canonical_layout(data)]
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LayoutCache:
+    """有上限的 LRU + TTL 快取，多執行緒共用"""
+
+    def __init__(self, maxsize=1024, ttl=3600, name="suggestion"):
+        self.name = name
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        cache_lookup(self.name, value is not None)
+        return value
+
+    def peek(self, key):
+        # 不計入命中率的查詢
+        with self._lock:
+            return self._cache.get(key)
+
+    def put(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cache)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+            }
+
+
+suggestion_cache = LayoutCache(
+    maxsize=int(os.getenv("SUGGESTION_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("SUGGESTION_CACHE_TTL", "3600")),
+)
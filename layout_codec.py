@@ -0,0 +1,70 @@
+"""給 prompt 用的精簡佈局編碼：一行表頭 + 每件物品一行，欄位名稱不再逐筆重複
+
+    type,kind,x,y,w,h,angle_deg
+    table,furniture,308,187,90,60,0
+    fan,fan,184,173,70,50,-45
+
+decode_items(encode_items(rows)) == rows（rows 為 normalize_items 的輸出）。
+"""
+import csv, io, math
+from collections.abc import Mapping
+
+from engine import to_number
+
+FIELDS = ("type", "kind", "x", "y", "w", "h", "angle_deg")
+TEXT_FIELDS = ("type", "kind")
+
+
+def _round(v, digits=1):
+    # 像素取到小數一位就夠；整數不帶 .0，省 token
+    v = round(float(v), digits)
+    return int(v) if v.is_integer() else v
+
+
+def normalize_items(items):
+    """前端物件 → prompt 用的列：弧度轉角度，數值四捨五入，缺值為 None"""
+    rows = []
+    for it in items or []:
+        if not isinstance(it, Mapping):
+            continue
+        row = {f: str(it[f]) if it.get(f) not in (None, "") else None for f in TEXT_FIELDS}
+        for f in ("x", "y", "w", "h"):
+            v = to_number(it.get(f), None)
+            row[f] = None if v is None else _round(v)
+        row["angle_deg"] = _round(math.degrees(to_number(it.get("angle"), 0.0)))
+        rows.append(row)
+    return rows
+
+
+def _cell(v):
+    return "" if v is None else str(v)
+
+
+def _parse(f, s):
+    if s == "":
+        return None
+    if f in TEXT_FIELDS:
+        return s
+    v = float(s)
+    return int(v) if "." not in s and "e" not in s.lower() else v
+
+
+def encode_items(rows):
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    w.writerow(FIELDS)
+    for row in rows:
+        w.writerow([_cell(row.get(f)) for f in FIELDS])
+    return buf.getvalue().rstrip("\n")
+
+
+def decode_items(text):
+    reader = csv.reader(io.StringIO(text))
+    header = next(reader)
+    return [{f: _parse(f, s) for f, s in zip(header, line)} for line in reader]
+
+
+def encode_canvas(canvas_size):
+    canvas = canvas_size if isinstance(canvas_size, Mapping) else {}
+    w, h = to_number(canvas.get("width"), None), to_number(canvas.get("height"), None)
+    return "未知" if w is None or h is None else f"{_round(w)}x{_round(h)}"
@@ -0,0 +1,90 @@
+"""非阻塞的結構化日誌：請求執行緒只把 record 放進佇列，背景 listener 負責格式化成 JSON 並寫出
+
+完整的 prompt / 回應依 LOG_SAMPLE_RATE 抽樣記錄，其餘只記長度與截斷後的摘要。
+"""
+import atexit, datetime, json, logging, logging.handlers, os, queue, random, sys
+
+from tracing import current_trace_id
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")            # json 或 text
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0"))   # 記錄完整 prompt/回應的比例（0~1）
+LOG_PREVIEW_CHARS = int(os.getenv("LOG_PREVIEW_CHARS", "200"))
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # 預設的 prepare 會在請求執行緒裡先格式化整筆訊息；這裡只合併 args，格式化留給 listener
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        # listener 執行緒看不到請求的 contextvars，trace id 要在這裡先取
+        record.trace_id = current_trace_id()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging():
+    """把 root logger 換成 QueueHandler；重複呼叫（例如 fork 之後）會重新啟動 listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+    q = queue.SimpleQueue()
+    out = logging.StreamHandler(sys.stdout)
+    out.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(
+        "%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers = [_QueueHandler(q)]
+    root.setLevel(LOG_LEVEL)
+    _listener = logging.handlers.QueueListener(q, out, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+@atexit.register
+def _flush():
+    if _listener is not None:
+        _listener.stop()
+
+
+def preview(text, limit=LOG_PREVIEW_CHARS):
+    text = text or ""
+    return text if len(text) <= limit else text[:limit] + f"…（共 {len(text)} 字）"
+
+
+def log_exchange(logger, key, prompt, response_text, elapsed, source="sync"):
+    """一次 Gemini 呼叫一筆紀錄：預設只有大小與摘要，抽中時附上完整內容"""
+    fields = {
+        "event": "gemini_exchange",
+        "key": key[:16] if key else None,
+        "source": source,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "prompt_chars": len(prompt or ""),
+        "response_chars": len(response_text or ""),
+        "response_preview": preview(response_text),
+    }
+    if LOG_SAMPLE_RATE and random.random() < LOG_SAMPLE_RATE:
+        fields.update(sampled=True, prompt=prompt, response=response_text)
+    logger.info("gemini_exchange", extra={"fields": fields})
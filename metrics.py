@@ -0,0 +1,63 @@
+"""Prometheus 指標：各處理階段延遲、上游錯誤、token 用量、快取命中與進行中的請求
+
+多個 gunicorn worker 時設定 PROMETHEUS_MULTIPROC_DIR（gunicorn.conf.py 會自動建立），
+每個 process 把數值寫進該目錄的 mmap 檔，/metrics 由任何一個 worker 讀取全部彙總；
+/api/stats 則只是處理該請求的 worker 自己的數字。
+"""
+import contextlib, os, time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+import tracing
+
+# 從毫秒級的 JSON 處理到數十秒的 Gemini 呼叫都要分得出來
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+stage_seconds = Histogram(
+    "coolspace_stage_seconds", "建議管線各階段耗時（parse_request / build_prompt / gemini / parse_response / serialize）",
+    ["source", "stage"], buckets=BUCKETS,
+)
+request_seconds = Histogram("coolspace_request_seconds", "整個 HTTP 請求耗時", ["route"], buckets=BUCKETS)
+requests_total = Counter("coolspace_requests_total", "HTTP 請求數", ["route", "status"])
+inflight = Gauge("coolspace_inflight_requests", "處理中的 HTTP 請求", ["route"], multiprocess_mode="livesum")
+gemini_inflight = Gauge("coolspace_gemini_inflight", "等待中的 Gemini 呼叫", multiprocess_mode="livesum")
+upstream_errors = Counter("coolspace_upstream_errors_total", "Gemini 呼叫失敗次數（重試用盡後）", ["type", "code"])
+tokens = Counter("coolspace_gemini_tokens_total", "Gemini token 用量", ["source", "kind"])
+cache_lookups = Counter("coolspace_cache_lookups_total", "快取查詢次數；命中率 = hit / (hit + miss)", ["cache", "result"])
+
+
+@contextlib.contextmanager
+def stage(source, name):
+    # 同一段也記成 trace 裡的 span
+    started = time.perf_counter()
+    try:
+        with tracing.span(name, source=source):
+            yield
+    finally:
+        stage_seconds.labels(source, name).observe(time.perf_counter() - started)
+
+
+def cache_lookup(cache, hit):
+    cache_lookups.labels(cache, "hit" if hit else "miss").inc()
+
+
+def upstream_error(e):
+    upstream_errors.labels(type(e).__name__, str(getattr(e, "code", None) or "")).inc()
+
+
+def record_tokens(source, counts):
+    for kind, n in counts.items():
+        if n:
+            tokens.labels(source, kind).inc(n)
+
+
+def render():
+    """回傳 (內容, Content-Type)"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,124 @@
+"""佈局請求的型別與上限：pydantic 編譯好的驗證器直接從原始 bytes 解析 JSON，格式或範圍不符時在任何 prompt 工作之前就拒絕
+
+Item / Layout 是 slots 的唯讀 dataclass（沒有每個物件一份的 __dict__），同時是 Mapping：
+engine、airflow、energy、layout_cache 等模組照舊用 .get() 讀取，dict 與模型都能處理。
+"""
+import dataclasses, os
+from collections.abc import Mapping
+from typing import Annotated, Literal, Optional, Union
+
+from pydantic import AfterValidator, Field, TypeAdapter, ValidationError
+from pydantic.dataclasses import dataclass
+
+REQUEST_MAX_BYTES = int(os.getenv("REQUEST_MAX_BYTES", str(64 * 1024)))
+REQUEST_MAX_ITEMS = int(os.getenv("REQUEST_MAX_ITEMS", "200"))
+CANVAS_MAX = 4096   # 畫布邊長上限（px）；氣流模擬與請求成本都跟著畫布大小走
+
+# 會直接寫進 prompt 的字串只允許簡單的識別字
+Name = Annotated[str, Field(pattern=r"^[A-Za-z0-9_-]{1,32}$")]
+
+
+def number(lo, hi):
+    # 整數維持整數（prompt 與快取 key 裡 26 不會變成 26.0）；拒絕 NaN / Infinity
+    return Union[
+        Annotated[int, Field(ge=lo, le=hi)],
+        Annotated[float, Field(ge=lo, le=hi, allow_inf_nan=False)],
+    ]
+
+
+def bounded(lo, hi):
+    return Optional[number(lo, hi)]
+
+
+def _unique(values):
+    if len(set(values)) != len(values):
+        raise ValueError("不可重複")
+    return values
+
+
+class InvalidRequest(ValueError):
+    def __init__(self, errors):
+        super().__init__("請求格式錯誤")
+        self.errors = errors
+
+
+class _Fields(Mapping):
+    """讓 slots dataclass 可以像 dict 一樣讀取"""
+    __slots__ = ()
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __iter__(self):
+        return (f.name for f in dataclasses.fields(self))
+
+    def __len__(self):
+        return len(dataclasses.fields(self))
+
+
+@dataclass(slots=True, frozen=True)
+class Item(_Fields):
+    type: Optional[Name] = None
+    kind: Optional[Literal["furniture", "fan", "ac"]] = None
+    x: bounded(-1e5, 1e5) = None
+    y: bounded(-1e5, 1e5) = None
+    w: bounded(0, 1e5) = None
+    h: bounded(0, 1e5) = None
+    angle: bounded(-1e3, 1e3) = None   # 弧度
+
+
+@dataclass(slots=True, frozen=True)
+class Canvas(_Fields):
+    width: bounded(1, CANVAS_MAX) = None
+    height: bounded(1, CANVAS_MAX) = None
+
+
+@dataclass(slots=True, frozen=True)
+class EnergyOptions(_Fields):
+    """/api/energy 的試算選項；情境表是 setpoints × months，兩者都有上限"""
+    setpoints: Optional[Annotated[tuple[number(16, 32), ...], Field(max_length=24), AfterValidator(_unique)]] = None
+    months: Optional[Annotated[tuple[Annotated[int, Field(ge=1, le=12)], ...], Field(max_length=12), AfterValidator(_unique)]] = None
+    hours: bounded(0, 24) = None       # 每日使用時數
+    other_kwh: bounded(0, 1e5) = None  # 家中其他用電（度 / 月）
+
+
+@dataclass(slots=True, frozen=True)
+class Layout(_Fields):
+    ac_temp: bounded(16, 32) = None
+    room_template: Optional[Name] = None
+    canvas_size: Optional[Canvas] = None
+    items: Annotated[tuple[Item, ...], Field(max_length=REQUEST_MAX_ITEMS)] = ()
+    contribute: bool = False
+    energy: Optional[EnergyOptions] = None
+
+
+_layout = TypeAdapter(Layout)
+# 不屬於欄位名稱的 loc 片段（union 的分支名稱）
+_UNION_TAGS = {"int", "float", "constrained-int", "constrained-float"}
+
+
+def _errors(e, prefix=()):
+    # 數值欄位的 int / float 兩個分支會各報一次，同一個欄位只留最後（float）的訊息
+    errors = {}
+    for err in e.errors(include_url=False):
+        errors[".".join(str(p) for p in prefix + err["loc"] if p not in _UNION_TAGS)] = err["msg"]
+    return [{"loc": loc, "msg": msg} for loc, msg in list(errors.items())[:10]]
+
+
+def parse_layout(raw):
+    """原始 JSON bytes → Layout；空的 body 視為 {}"""
+    try:
+        return _layout.validate_json(raw or b"{}")
+    except ValidationError as e:
+        raise InvalidRequest(_errors(e)) from None
+
+
+def validate_layout(data, index=None):
+    """已經解析過的 JSON（例如批次裡的一筆）→ Layout"""
+    try:
+        return _layout.validate_python(data)
+    except ValidationError as e:
+        raise InvalidRequest(_errors(e, () if index is None else ("layouts", index))) from None
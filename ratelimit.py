@@ -0,0 +1,133 @@
+"""每個用戶端（IP 或 session）各自的 token bucket 限流
+
+桶子空了不立刻拒絕：需要等待的時間在 max_wait 內、且排隊人數未滿時先預約下一個 token 再等；
+否則回 429 並附上 Retry-After。限制依路由群組設定，例如兩個會呼叫 Gemini 的建議路由共用同一組額度。
+"""
+import asyncio, math, os, threading, time
+
+from cachetools import TTLCache
+
+RATE_LIMIT = os.getenv("RATE_LIMIT", "1") == "1"
+# ip：依來源位址；session：依 X-Session-Id（應由前面的登入代理設定，用戶端自己帶的值可以隨意更換），沒有時退回 ip
+RATE_LIMIT_BY = os.getenv("RATE_LIMIT_BY", "ip")
+# 前面有幾層信任的反向代理；> 0 時取 X-Forwarded-For 從右數第 N 個位址（最外層代理附加的那一個）。
+# 最左邊的位址是用戶端自己可以填的，不能拿來限流（和 werkzeug ProxyFix(x_for=N) 相同）
+TRUST_PROXY = int(os.getenv("TRUST_PROXY", "0"))
+SESSION_HEADER = "X-Session-Id"
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"請求太頻繁，請 {retry_after:g} 秒後再試")
+        self.retry_after = retry_after
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "waiting")
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.updated = now
+        self.waiting = 0
+
+
+class RateLimiter:
+    def __init__(self, rate, burst, max_wait=2.0, max_queue=2, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        # 閒置到桶子補滿的用戶端就不必再記
+        self._buckets = TTLCache(maxsize=max_clients, ttl=max(60.0, burst / rate))
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.delayed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+
+    def reserve(self, client, cost=1):
+        """預約 cost 個 token，回傳需要等待的秒數；超過等待上限或排隊已滿時丟 RateLimited"""
+        now = time.monotonic()
+        with self._lock:
+            b = self._buckets.get(client) or _Bucket(self.burst, now)
+            b.tokens = min(self.burst, b.tokens + (now - b.updated) * self.rate)
+            b.updated = now
+            self._buckets[client] = b
+            wait = max(0.0, (cost - b.tokens) / self.rate)
+            if wait > self.max_wait or (wait and b.waiting >= self.max_queue):
+                self.rejected += 1
+                raise RateLimited(math.ceil(wait))
+            b.tokens -= cost
+            self.admitted += 1
+            if wait:
+                b.waiting += 1
+                self.delayed += 1
+                self.wait_total += wait
+            return wait
+
+    def _done(self, client):
+        with self._lock:
+            b = self._buckets.get(client)
+            if b is not None and b.waiting:
+                b.waiting -= 1
+
+    def acquire(self, client, cost=1):
+        wait = self.reserve(client, cost)
+        if wait:
+            try:
+                time.sleep(wait)
+            finally:
+                self._done(client)
+
+    async def acquire_async(self, client, cost=1):
+        wait = self.reserve(client, cost)
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._done(client)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "clients": len(self._buckets),
+                "admitted": self.admitted,
+                "delayed": self.delayed,
+                "rejected": self.rejected,
+                "wait_avg_ms": round(self.wait_total / self.delayed * 1000, 1) if self.delayed else 0.0,
+            }
+
+
+def _limit(name, rate, burst, max_wait):
+    # RATE_LIMIT_<NAME>="每秒次數:burst:最長等待秒數"，例如 RATE_LIMIT_SUGGESTIONS="0.5:5:2"
+    spec = os.getenv(f"RATE_LIMIT_{name.upper()}")
+    if spec:
+        values = [float(p) for p in spec.split(":")][:3]
+        rate, burst, max_wait = values + [rate, burst, max_wait][len(values):]
+    return RateLimiter(rate, burst, max_wait, max_queue=int(os.getenv("RATE_LIMIT_QUEUE", "2")))
+
+
+# 路由群組 → 限流器；suggestions 是會呼叫 Gemini 的路由（一般與串流）共用
+limiters = {
+    "suggestions": _limit("suggestions", 0.5, 5, 2),
+    "batch": _limit("batch", 1 / 60, 2, 0),
+    "local": _limit("local", 10, 20, 0.5),
+}
+
+
+def client_id(headers, remote_addr):
+    session = headers.get(SESSION_HEADER) if RATE_LIMIT_BY == "session" else None
+    if session:
+        return "s:" + session[:64]
+    if TRUST_PROXY and headers.get("X-Forwarded-For"):
+        hops = [h.strip() for h in headers["X-Forwarded-For"].split(",")]
+        # 位址數比信任的代理層數少時，header 不是那些代理設的，不採用
+        if len(hops) >= TRUST_PROXY and hops[-TRUST_PROXY]:
+            return "ip:" + hops[-TRUST_PROXY]
+    return "ip:" + (remote_addr or "?")
+
+
+def stats():
+    return {"enabled": RATE_LIMIT, **{name: limiter.stats() for name, limiter in limiters.items()}}
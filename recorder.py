@@ -0,0 +1,176 @@
+"""Gemini 回應的錄製 / 重播
+
+GEMINI_RECORD=record：每次 Gemini 呼叫把原始請求、快取 key、完整回應與耗時附加到 JSONL 檔，
+由背景執行緒批次寫入（序列化也在那裡做），請求路徑只放進佇列。
+GEMINI_RECORD=replay：call_gemini_sync / call_gemini_async 依快取 key 回傳錄到的回應，
+可按 GEMINI_REPLAY_LATENCY 倍數重現當時的延遲；完全不連網，用同一批流量重跑效能回歸測試。
+"""
+import asyncio, atexit, json, logging, os, queue, threading, time
+
+log = logging.getLogger(__name__)
+
+GEMINI_RECORD = os.getenv("GEMINI_RECORD", "off")              # off / record / replay
+GEMINI_RECORD_FILE = os.getenv("GEMINI_RECORD_FILE", "recordings.jsonl")
+GEMINI_REPLAY_LATENCY = float(os.getenv("GEMINI_REPLAY_LATENCY", "0"))   # 0：立即回傳；1：照錄到的耗時等待
+
+
+class ReplayMiss(LookupError):
+    pass
+
+
+def dump_response(response):
+    """SDK 回應 → 可以再 model_validate 回來的 JSON；沒有 model_dump 的物件（測試替身）只留文字"""
+    if hasattr(response, "model_dump"):
+        return response.model_dump(mode="json", exclude_none=True, exclude={"sdk_http_response"})
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": response.text}]}}]}
+
+
+class GeminiRecorder:
+    def __init__(self, mode=GEMINI_RECORD, path=GEMINI_RECORD_FILE, latency=GEMINI_REPLAY_LATENCY,
+                 flush_interval=0.5, max_queue=10000):
+        self.mode = mode
+        self.path = path
+        self.latency = latency
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._recordings = None
+        self._cursor = {}
+        self._types = None
+        self.recorded = 0
+        self.dropped = 0
+        self.replayed = 0
+        self.misses = 0
+
+    @property
+    def recording(self):
+        return self.mode == "record"
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    # ---- 錄製 ----
+
+    def record(self, key, data, response, elapsed, source):
+        if not self.recording:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="gemini-recorder", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait((time.time(), key, data, response, elapsed, source))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _line(self, ts, key, data, response, elapsed, source):
+        return json.dumps({
+            "ts": round(ts, 3),
+            "key": key,
+            "source": source,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "request": data,
+            "response": dump_response(response),
+        }, ensure_ascii=False, separators=(",", ":"), default=dict) + "\n"   # models.Layout / Item 是 Mapping
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                items = [self._queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    try:
+                        items.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        break
+                lines, events = [], []
+                for item in items:
+                    if isinstance(item, threading.Event):
+                        events.append(item)
+                        continue
+                    try:
+                        lines.append(self._line(*item))
+                    except Exception:
+                        log.exception("無法序列化錄製的回應，略過")
+                f.writelines(lines)
+                f.flush()
+                with self._lock:
+                    self.recorded += len(lines)
+                for event in events:
+                    event.set()
+
+    def flush(self, timeout=5.0):
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    # ---- 重播 ----
+
+    def load(self):
+        """讀入錄製檔（第一次重播時也會自動載入）；google.genai 的 types 也在這裡先 import"""
+        from google.genai import types
+        self._types = types
+        recordings = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    recordings.setdefault(entry["key"], []).append(entry)
+        log.info("載入 %d 個佈局的錄製回應（%s）", len(recordings), self.path)
+        with self._lock:
+            self._recordings = recordings
+            self._cursor = {}
+
+    def lookup(self, key):
+        """同一個 key 錄到多次時依序輪流回傳，重跑的結果與延遲分布和錄製時一致"""
+        if self._recordings is None:
+            self.load()
+        with self._lock:
+            entries = self._recordings.get(key)
+            if not entries:
+                self.misses += 1
+                raise ReplayMiss(f"沒有錄到這個請求：{key}")
+            i = self._cursor.get(key, 0)
+            self._cursor[key] = i + 1
+            self.replayed += 1
+        entry = entries[i % len(entries)]
+        # parsed 的型別是 Union[BaseModel, dict, Enum]，model_validate 會把 dict 還原成空的 BaseModel，另外放回去
+        data = dict(entry["response"])
+        parsed = data.pop("parsed", None)
+        response = self._types.GenerateContentResponse.model_validate(data)
+        response.parsed = parsed
+        return response, entry["elapsed_ms"] / 1000 * self.latency
+
+    def replay(self, key):
+        response, delay = self.lookup(key)
+        if delay:
+            time.sleep(delay)
+        return response
+
+    async def replay_async(self, key):
+        response, delay = self.lookup(key)
+        if delay:
+            await asyncio.sleep(delay)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "file": self.path if self.mode != "off" else None,
+                "recorded": self.recorded,
+                "dropped": self.dropped,
+                "queue_depth": self._queue.qsize(),
+                "replayed": self.replayed,
+                "misses": self.misses,
+                "keys": len(self._recordings) if self._recordings is not None else None,
+            }
+
+
+recorder = GeminiRecorder()
+atexit.register(recorder.flush)
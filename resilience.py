@@ -0,0 +1,181 @@
+import concurrent.futures, contextlib, os, threading, time
+import httpx
+from tenacity import (
+    AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, stop_after_delay,
+    wait_random_exponential,
+)
+
+from gemini_client import api_error_types
+
+# 值得重試的 HTTP 狀態碼：限流與上游暫時性錯誤
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def is_retryable(e):
+    if isinstance(e, api_error_types()):
+        return e.code in RETRY_STATUS
+    # 連線被重置之類的傳輸錯誤可以重試；逾時代表 deadline 已經用掉，不再重試
+    return isinstance(e, httpx.TransportError) and not isinstance(e, httpx.TimeoutException)
+
+
+def is_upstream_failure(e):
+    """Gemini 本身出問題（而不是請求內容有誤）：計入斷路器，並改回本地分析結果"""
+    return (
+        is_retryable(e)
+        or isinstance(e, (TimeoutError, concurrent.futures.TimeoutError, httpx.TimeoutException, CircuitOpenError))
+    )
+
+
+class RetryStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.giveups = 0
+
+    def inc(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "retries": self.retries, "giveups": self.giveups}
+
+
+retry_stats = RetryStats()
+
+
+def _retry_kwargs(attempts, deadline):
+    def give_up(state):
+        retry_stats.inc("giveups")
+        state.outcome.result()  # 把最後一次的例外原樣丟出
+
+    return dict(
+        stop=stop_after_attempt(attempts) | stop_after_delay(deadline),
+        wait=wait_random_exponential(multiplier=0.5, max=8),  # full jitter 的指數退避
+        retry=retry_if_exception(is_retryable),
+        before_sleep=lambda state: retry_stats.inc("retries"),
+        retry_error_callback=give_up,
+    )
+
+
+def with_retries(fn, *args, attempts=3, deadline=25, **kwargs):
+    retry_stats.inc("calls")
+    return Retrying(**_retry_kwargs(attempts, deadline))(fn, *args, **kwargs)
+
+
+async def with_retries_async(fn, *args, attempts=3, deadline=25, **kwargs):
+    retry_stats.inc("calls")
+    return await AsyncRetrying(**_retry_kwargs(attempts, deadline))(fn, *args, **kwargs)
+
+
+class CircuitBreaker:
+    """整個 process 共用的斷路器
+
+    closed：正常放行；連續 failure_threshold 次上游失敗就 open
+    open：直接丟 CircuitOpenError，不再等上游；reset_timeout 秒後轉 half_open
+    half_open：只放 half_open_max 個試探請求，成功就 closed，失敗就再 open
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, half_open_max=1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self.opened = 0
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError("Gemini 斷路器開啟中")
+                self.state = "half_open"
+                self._trials = 0
+            if self.state == "half_open":
+                if self._trials >= self.half_open_max:
+                    self.rejected += 1
+                    raise CircuitOpenError("Gemini 斷路器試探中")
+                self._trials += 1
+
+    def _open(self):
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._trials = 0
+        self.opened += 1
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self._failures = 0
+            if self.state == "half_open":
+                self.state = "closed"
+                self._trials = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self._open()
+
+    def _release(self):
+        # 請求被取消（例如用戶端斷線）：不算成功也不算失敗，只歸還試探名額
+        with self._lock:
+            if self.state == "half_open" and self._trials:
+                self._trials -= 1
+
+    @contextlib.contextmanager
+    def guard(self):
+        self.allow()
+        try:
+            yield
+        except Exception as e:
+            if is_upstream_failure(e):
+                self.record_failure()
+            else:
+                # 上游有回應，只是請求本身有問題
+                self.record_success()
+            raise
+        except BaseException:
+            self._release()
+            raise
+        else:
+            self.record_success()
+
+    def call(self, fn, *args, **kwargs):
+        with self.guard():
+            return fn(*args, **kwargs)
+
+    async def call_async(self, fn, *args, **kwargs):
+        with self.guard():
+            return await fn(*args, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "successes": self.successes,
+                "failures": self.failures,
+            }
+
+
+gemini_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.getenv("BREAKER_RESET", "30")),
+    half_open_max=int(os.getenv("BREAKER_HALF_OPEN", "1")),
+)
@@ -0,0 +1,126 @@
+import asyncio, os, threading
+
+
+class SingleFlightTimeout(TimeoutError):
+    pass
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """相同 key 的請求同時進來時只執行一次 fn，其餘請求等待並共用結果（或例外）"""
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0      # 實際執行 fn 的次數
+        self.coalesced = 0    # 搭便車、沒有另外呼叫上游的次數
+        self.timeouts = 0     # 等待逾時的次數
+        self.errors = 0       # fn 丟出例外的次數
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not call.event.wait(self.timeout if timeout is None else timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise SingleFlightTimeout(f"等待相同請求的結果逾時：{key}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "in_flight": len(self._calls),
+            }
+
+
+class AsyncSingleFlight:
+    """SingleFlight 的 asyncio 版本；上游呼叫以獨立 task 執行，第一個請求斷線也不會中斷其他人的等待"""
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def _done(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 取出例外，避免沒有等待者時出現 "exception was never retrieved"
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    async def do(self, key, fn, timeout=None):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self.leaders += 1
+            task.add_done_callback(lambda t: self._done(key, t))
+            return await asyncio.shield(task)
+
+        self.coalesced += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            if task.done():
+                raise
+            self.timeouts += 1
+            raise SingleFlightTimeout(f"等待相同請求的結果逾時：{key}")
+
+    def in_flight(self):
+        return len(self._calls)
+
+    def stats(self):
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "in_flight": len(self._calls),
+        }
+
+
+suggestion_flight = SingleFlight(timeout=float(os.getenv("SINGLEFLIGHT_TIMEOUT", "90")))
+suggestion_flight_async = AsyncSingleFlight(timeout=float(os.getenv("SINGLEFLIGHT_TIMEOUT", "90")))
@@ -24,7 +24,7 @@ document.addEventListener('DOMContentLoaded', () => {
 if (suggestionBtn && suggestionBlock && suggestionList) {
   // 確保有 window.entities（你下方已經有 const entities = [];）
   window.entities = window.entities || [];
-    async function fetchAISuggestions() {
+    function buildPayload() {
         const r = canvas.getBoundingClientRect();
         const items = (window.entities || []).map(it => ({
             type: it.type,    // 'sofa' | 'table' | ... | 'fan' | 'ac'
@@ -35,39 +35,109 @@ if (suggestionBtn && suggestionBlock && suggestionList) {
             h: Math.round(it.h),
             angle: +(it.angle || 0).toFixed(3)
         }));
-  const payload = {
+  return {
     ac_temp: Number(document.getElementById('acTemp')?.value || 26),
     room_template: document.getElementById('roomTemplate')?.value || 'custom',
+    contribute: !!document.getElementById('contributeConsent')?.checked,  // 使用者同意才匿名上傳
     canvas_size: { width: Math.round(r.width), height: Math.round(r.height) },
     items
   };
+    }
+
+    // 被限流（429）時後端會附上 Retry-After
+    function apiError(res) {
+    if (res.status === 429) {
+        return new Error(`請求太頻繁，請 ${res.headers.get('Retry-After') || '幾'} 秒後再試`);
+    }
+    return new Error('API 失敗');
+    }
+
+    async function fetchAISuggestions() {
     const res = await fetch('/api/suggestions', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(payload)
+        body: JSON.stringify(buildPayload())
     });
-    if (!res.ok) throw new Error('API 失敗');
+    if (!res.ok) throw apiError(res);
     const data = await res.json();
     return data; // ⬅️ 回傳整包
     }
 
+    // 串流版本（SSE）：每完成一則建議/分析/指標就呼叫對應的 handler
+    async function streamAISuggestions(handlers) {
+    const res = await fetch('/api/suggestions/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(buildPayload())
+    });
+    if (!res.ok || !res.body) throw apiError(res);
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buf += decoder.decode(value, { stream: true });
+        let idx;
+        while ((idx = buf.indexOf('\n\n')) >= 0) {
+            const block = buf.slice(0, idx);
+            buf = buf.slice(idx + 2);
+            let event = 'message', data = '';
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            const payload = data ? JSON.parse(data) : null;
+            if (event === 'error') throw new Error(payload?.error || 'API 失敗');
+            handlers[event]?.(payload);
+        }
+    }
+    }
+
+    // 後端 Gemini 逾時改用本地分析時附上的提示
+    const DEGRADED_NOTE = '（AI 回應逾時，以上為系統本地快速分析結果）';
+
+    function appendItem(list, text) {
+        const li = document.createElement('li');
+        li.textContent = text;
+        list.appendChild(li);
+    }
+
     // 按鈕監聽處改成：
     suggestionBtn.addEventListener('click', async () => {
     suggestionBtn.disabled = true;
     const oldText = suggestionBtn.textContent;
-    suggestionBtn.textContent = '不要急 請等至少1分鐘以上再說出bug';
+    suggestionBtn.textContent = '⏳ 建議產生中，會陸續顯示…';
+    const analysisList = document.getElementById('analysisText');
+    suggestionList.innerHTML = '';
+    if (analysisList) analysisList.innerHTML = '';
+    suggestionBlock.classList.remove('hidden');
+    let count = 0;
     try {
-        const data = await fetchAISuggestions();        // ⬅️ 拿整包
-        const tips = Array.isArray(data.suggestions) ? data.suggestions : [];
-        suggestionList.innerHTML = tips.length
-        ? tips.map(t => `<li>${t}</li>`).join('')
-        : '<li>目前沒有建議，請先在畫布擺放一些物件再試一次。</li>';
-        updateMetrics(data.metrics);                    // ⬅️ 更新指標
-        suggestionBlock.classList.remove('hidden');
-        suggestionBlock.scrollIntoView({ behavior: 'smooth', block: 'center' });
+        if (window.ReadableStream && window.TextDecoder) {
+            await streamAISuggestions({
+                suggestion: t => {
+                    appendItem(suggestionList, t);
+                    // 第一則建議出現時捲到建議區
+                    if (count++ === 0) suggestionBlock.scrollIntoView({ behavior: 'smooth', block: 'center' });
+                },
+                analysis: t => analysisList && appendItem(analysisList, t),
+                metric: m => updateMetrics({ [m.name]: m.value }),  // ⬅️ 指標逐一更新
+                done: d => d?.degraded && appendItem(suggestionList, DEGRADED_NOTE)
+            });
+        } else {
+            const data = await fetchAISuggestions();        // ⬅️ 不支援串流：拿整包
+            const tips = Array.isArray(data.suggestions) ? data.suggestions : [];
+            tips.forEach(t => appendItem(suggestionList, t));
+            if (analysisList) (data.analysis || []).forEach(t => appendItem(analysisList, t));
+            count = tips.length;
+            updateMetrics(data.metrics);                    // ⬅️ 更新指標
+            if (data.degraded) appendItem(suggestionList, DEGRADED_NOTE);
+            suggestionBlock.scrollIntoView({ behavior: 'smooth', block: 'center' });
+        }
+        if (!count) suggestionList.innerHTML = '<li>目前沒有建議，請先在畫布擺放一些物件再試一次。</li>';
     } catch (err) {
-        suggestionList.innerHTML = `<li>產生建議時發生錯誤：${err.message}</li>`;
-        suggestionBlock.classList.remove('hidden');
+        appendItem(suggestionList, `產生建議時發生錯誤：${err.message}`);
     } finally {
         suggestionBtn.disabled = false;
         suggestionBtn.textContent = oldText;
@@ -394,3 +464,51 @@ function setMeterColor(el, value) {
   }
 }
 
+
+// ====== 分頁切換 + 數據分析圖表 ======
+document.addEventListener('DOMContentLoaded', () => {
+  const buttons = document.querySelectorAll('.tab-btn');
+  let dailyChart = null;
+
+  async function loadAnalytics() {
+    const el = document.getElementById('dailyChart');
+    if (!el || !window.Chart) return;
+    // 後端只讀每日彙總表，每次切換都重新抓最新數字
+    const res = await fetch('/api/analytics?period=day&count=30');
+    if (!res.ok) return;
+    const data = await res.json();
+    const series = data.series || [];
+    const datasets = [
+      { type: 'bar', label: '分析次數', data: series.map(s => s.requests), yAxisID: 'count',
+        backgroundColor: 'rgba(124,92,255,.45)' },
+      { type: 'line', label: '平均舒適度', data: series.map(s => s.avg_comfort), yAxisID: 'score',
+        borderColor: '#3ecf8e', spanGaps: true, tension: .3 },
+      { type: 'line', label: '平均氣流效率', data: series.map(s => s.avg_airflow), yAxisID: 'score',
+        borderColor: '#4fc3f7', spanGaps: true, tension: .3 },
+    ];
+    const labels = series.map(s => s.bucket.slice(5));  // MM-DD
+    if (dailyChart) {
+      dailyChart.data.labels = labels;
+      dailyChart.data.datasets.forEach((ds, i) => { ds.data = datasets[i].data; });
+      dailyChart.update();
+      return;
+    }
+    dailyChart = new Chart(el, {
+      data: { labels, datasets },
+      options: {
+        maintainAspectRatio: false,
+        scales: {
+          count: { position: 'left', beginAtZero: true, ticks: { precision: 0 } },
+          score: { position: 'right', min: 0, max: 10, grid: { drawOnChartArea: false } },
+        },
+      },
+    });
+  }
+
+  buttons.forEach(btn => btn.addEventListener('click', () => {
+    buttons.forEach(b => b.classList.toggle('active', b === btn));
+    document.querySelectorAll('.tab-content').forEach(c => c.classList.toggle('active', c.id === btn.dataset.tab));
+    if (btn.dataset.tab === 'analytics') loadAnalytics().catch(console.error);
+    else window.dispatchEvent(new Event('resize'));  // 模擬畫布隱藏時量不到尺寸，切回來重新量
+  }));
+});
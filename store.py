@@ -0,0 +1,215 @@
+"""匿名資料貢獻：使用者同意後，把標準化佈局與分析結果寫進 SQLite；所有結果都計入 analytics 的彙總
+
+請求執行緒只把紀錄放進佇列（滿了就丟棄並計數，絕不阻塞）；
+單一背景執行緒以 WAL 模式、每批一個 transaction 寫入，fsync 不會出現在請求路徑上。
+"""
+import atexit, json, logging, os, queue, sqlite3, threading, time
+
+import analytics
+from layout_cache import canonical_layout
+
+log = logging.getLogger(__name__)
+
+CONTRIB_DB = os.getenv("CONTRIB_DB", "coolspace.db")
+CONTRIB_BATCH = int(os.getenv("CONTRIB_BATCH", "500"))
+CONTRIB_FLUSH_INTERVAL = float(os.getenv("CONTRIB_FLUSH_INTERVAL", "0.2"))
+CONTRIB_QUEUE = int(os.getenv("CONTRIB_QUEUE", "50000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contributions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    layout_key TEXT,
+    ac_temp REAL,
+    room_template TEXT,
+    engine TEXT,
+    comfort INTEGER,
+    airflow INTEGER,
+    energy TEXT,
+    recommended_temp INTEGER,
+    layout TEXT NOT NULL,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contributions_created ON contributions (created);
+"""
+
+INSERT = """
+INSERT INTO contributions (created, layout_key, ac_temp, room_template, engine, comfort, airflow, energy,
+                           recommended_temp, layout, result)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _int(v):
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def make_sample(result, now):
+    """回應 → 彙總用的 (created, engine, comfort, airflow, energy, recommended_temp)"""
+    metrics = result.get("metrics") or {}
+    engine = "degraded" if result.get("degraded") else result.get("engine", "gemini")
+    return (
+        now,
+        engine,
+        _int(metrics.get("舒適度評分")),
+        _int(metrics.get("氣流效率")),
+        metrics.get("能耗指數"),
+        _int(metrics.get("建議冷氣溫度")),
+    )
+
+
+def make_row(data, result, key=None, now=None):
+    """請求 + 回應（/api/suggestions 格式）→ contributions 的一列；不含 IP 等任何用戶端資訊"""
+    now, engine, comfort, airflow, energy, temp = make_sample(result, time.time() if now is None else now)
+    layout = canonical_layout(data)
+    try:
+        ac_temp = float(layout["ac_temp"])
+    except (TypeError, ValueError):
+        ac_temp = None
+    return (
+        now, key, ac_temp, layout["room_template"], engine, comfort, airflow, energy, temp,
+        json.dumps(layout, ensure_ascii=False, separators=(",", ":")),
+        json.dumps(result, ensure_ascii=False, separators=(",", ":")),
+    )
+
+
+def connect(path=CONTRIB_DB):
+    # 多個 worker process 共用同一個檔案時，等待其他寫入者最多 30 秒
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL 下 NORMAL 只在 checkpoint 時 fsync，當機最多遺失最後幾批，不會損毀資料庫
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA + analytics.SCHEMA)
+    return conn
+
+
+_readers = threading.local()
+
+
+def reader(path=CONTRIB_DB):
+    """每個執行緒一個唯讀用途的連線；WAL 下讀取不會被寫入執行緒擋住"""
+    conn = getattr(_readers, "conn", None)
+    if conn is None or getattr(_readers, "path", None) != path:
+        conn = _readers.conn = connect(path)
+        _readers.path = path
+    return conn
+
+
+class ContributionWriter:
+    def __init__(self, path=CONTRIB_DB, batch=CONTRIB_BATCH, flush_interval=CONTRIB_FLUSH_INTERVAL,
+                 max_queue=CONTRIB_QUEUE, on_commit=None):
+        self.path = path
+        self.batch = batch
+        self.flush_interval = flush_interval
+        # on_commit(conn, samples)：在同一個 transaction 裡執行，用來維護彙總表
+        self.on_commit = on_commit
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.submitted = 0
+        self.written = 0
+        self.aggregated = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        self.commit_total = 0.0
+        self.commit_max = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="contrib-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, data, result, key=None, store=True):
+        """只放進佇列；轉成資料列（標準化佈局、JSON 序列化）在寫入執行緒做。store=False 只計入彙總"""
+        self.start()
+        try:
+            self._queue.put_nowait((time.time(), data, result, key, store))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def flush(self, timeout=5.0):
+        """等到目前佇列裡的紀錄都寫入為止（關機或測試用）"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _drain(self):
+        rows, samples, events = [], [], []
+        item = self._queue.get()
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if isinstance(item, threading.Event):
+                events.append(item)
+                break
+            now, data, result, key, store = item
+            try:
+                samples.append(make_sample(result, now))
+                if store:
+                    rows.append(make_row(data, result, key, now))
+            except Exception:
+                log.exception("無法轉換貢獻資料，略過")
+            if len(samples) >= self.batch:
+                break
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+        return rows, samples, events
+
+    def _run(self):
+        conn = connect(self.path)
+        while True:
+            rows, samples, events = self._drain()
+            if samples:
+                started = time.perf_counter()
+                try:
+                    with conn:
+                        conn.executemany(INSERT, rows)
+                        if self.on_commit is not None:
+                            self.on_commit(conn, samples)
+                except sqlite3.Error:
+                    log.exception("寫入 %d 筆貢獻資料失敗", len(samples))
+                    with self._lock:
+                        self.errors += 1
+                else:
+                    elapsed = time.perf_counter() - started
+                    with self._lock:
+                        self.written += len(rows)
+                        self.aggregated += len(samples)
+                        self.batches += 1
+                        self.commit_total += elapsed
+                        self.commit_max = max(self.commit_max, elapsed)
+            for event in events:
+                event.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "db": self.path,
+                "queue_depth": self._queue.qsize(),
+                "submitted": self.submitted,
+                "written": self.written,
+                "aggregated": self.aggregated,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "errors": self.errors,
+                "avg_batch": round(self.aggregated / self.batches, 1) if self.batches else 0.0,
+                "commit_avg_ms": round(self.commit_total / self.batches * 1000, 2) if self.batches else 0.0,
+                "commit_max_ms": round(self.commit_max * 1000, 2),
+            }
+
+
+contributions = ContributionWriter(on_commit=analytics.apply)
+atexit.register(contributions.flush)
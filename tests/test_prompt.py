@@ -0,0 +1,39 @@
+"""prompt 的兩個保證：佈局精簡編碼可無損還原、參考佈局的 prompt 不超過 token 預算
+
+    python -m pytest tests
+"""
+import math, os, random, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bench")]
+os.environ.setdefault("API_KEY", "test")
+os.environ.setdefault("CONTEXT_CACHE", "0")
+
+import prompt_budget
+from layout_codec import decode_items, encode_items, normalize_items
+
+
+def random_item(rng):
+    def maybe(v):
+        return None if rng.random() < 0.1 else v
+    return {
+        "type": maybe(rng.choice(["table", "bed", "fan", "ac", "a,b", 'say "hi"', "沙發", "12", " "])),
+        "kind": maybe(rng.choice(["furniture", "fan", "ac"])),
+        "x": maybe(rng.uniform(-1e4, 1e4)),
+        "y": maybe(rng.choice([rng.randint(-500, 5000), rng.uniform(0, 1e3)])),
+        "w": maybe(rng.choice([rng.randint(0, 400), 1e-9, 123456.789])),
+        "h": maybe(rng.uniform(0, 400)),
+        "angle": maybe(rng.uniform(-4 * math.pi, 4 * math.pi)),
+    }
+
+
+def test_layout_codec_round_trip():
+    rng = random.Random(0)
+    for _ in range(2000):
+        rows = normalize_items([random_item(rng) for _ in range(rng.randint(0, 12))])
+        assert decode_items(encode_items(rows)) == rows
+
+
+def test_prompt_within_budget():
+    full = prompt_budget.server.SYSTEM_INSTRUCTION + prompt_budget.server.render_prompt(prompt_budget.reference_layout())
+    assert prompt_budget.estimate_tokens(full) <= prompt_budget.BUDGET_TOKENS
@@ -0,0 +1,213 @@
+"""輕量的請求追蹤：每個請求一個 trace，管線裡的每個步驟是一個 span（欄位比照 OpenTelemetry）
+
+目前的 span 存在 contextvars 裡；丟進 executor 的工作用 submit() 帶著 context 過去，子 span 才接得回同一個 trace。
+trace id 會寫進每筆日誌並以 X-Trace-Id 回給用戶端（也接受上游帶來的 W3C traceparent）。
+完成的 trace 放在記憶體的環狀緩衝區，用 /api/traces 依耗時查詢；設定 TRACE_FILE 時，
+超過 TRACE_SLOW_MS 的 trace 另外以 JSONL 附加寫入檔案，不需要外部 collector。
+"""
+import collections, contextlib, contextvars, datetime, json, logging, os, re, secrets, threading, time
+
+log = logging.getLogger(__name__)
+
+TRACE = os.getenv("TRACE", "1") == "1"
+TRACE_BUFFER = int(os.getenv("TRACE_BUFFER", "500"))
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "1000"))
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_current = contextvars.ContextVar("span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "end", "attributes", "error", "_t0")
+
+    def __init__(self, trace, name, parent_id=None, attributes=None):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.end = None
+        self.attributes = attributes or {}
+        self.error = None
+        self._t0 = time.perf_counter()
+
+    def finish(self, error=None):
+        self.end = self.start + (time.perf_counter() - self._t0)
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self):
+        return round(((self.end or time.time()) - self.start) * 1000, 3)
+
+    def to_dict(self):
+        return {
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start": _iso(self.start),
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "status": "ERROR" if self.error else "OK" if self.end else "UNSET",
+            **({"error": self.error} if self.error else {}),
+        }
+
+
+class Trace:
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        # executor 裡的子 span 會從其他執行緒加進來
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def to_dict(self):
+        with self._lock:
+            spans = list(self.spans)
+        root = spans[0]
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name,
+            "start": _iso(root.start),
+            "duration_ms": root.duration_ms,
+            "status": "ERROR" if root.error else "OK",
+            "attributes": root.attributes,
+            "spans": [s.to_dict() for s in spans],
+        }
+
+
+def _iso(ts):
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).isoformat(timespec="microseconds")
+
+
+class TraceExporter:
+    """最近完成的 trace 留在記憶體；慢的另外附加寫入 JSONL 檔"""
+
+    def __init__(self, size=TRACE_BUFFER, path=TRACE_FILE, slow_ms=TRACE_SLOW_MS):
+        self._traces = collections.OrderedDict()
+        self.size = size
+        self.path = path
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._file = None
+        self.exported = 0
+        self.written = 0
+
+    def export(self, trace):
+        with self._lock:
+            self._traces[trace.trace_id] = trace
+            while len(self._traces) > self.size:
+                self._traces.popitem(last=False)
+            self.exported += 1
+        if self.path and trace.spans[0].duration_ms >= self.slow_ms:
+            self._write(trace)
+
+    def _write(self, trace):
+        line = json.dumps(trace.to_dict(), ensure_ascii=False, separators=(",", ":")) + "\n"
+        try:
+            with self._lock:
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(line)
+                self._file.flush()
+                self.written += 1
+        except OSError:
+            log.exception("無法寫入 trace 檔 %s", self.path)
+
+    def get(self, trace_id):
+        with self._lock:
+            trace = self._traces.get(trace_id)
+        return trace.to_dict() if trace else None
+
+    def recent(self, limit=20, min_ms=0.0):
+        """耗時最長的在前，只列摘要（不含 span）"""
+        with self._lock:
+            traces = list(self._traces.values())
+        summaries = [t.to_dict() for t in traces]
+        summaries = [dict(s, spans=len(s["spans"])) for s in summaries if s["duration_ms"] >= min_ms]
+        summaries.sort(key=lambda s: s["duration_ms"], reverse=True)
+        return summaries[:limit]
+
+    def stats(self):
+        with self._lock:
+            return {"enabled": TRACE, "stored": len(self._traces), "exported": self.exported,
+                    "file": self.path or None, "written": self.written, "slow_ms": self.slow_ms}
+
+
+exporter = TraceExporter()
+
+
+def start_trace(name, traceparent=None, **attributes):
+    """開始一個 trace 並把根 span 設為目前的 span；回傳 (根 span, contextvars token)，TRACE=0 時為 (None, None)"""
+    if not TRACE:
+        return None, None
+    match = TRACEPARENT.match(traceparent or "")
+    trace = Trace(match.group(1) if match else None)
+    root = trace.add(Span(trace, name, match.group(2) if match else None, attributes))
+    return root, _current.set(root)
+
+
+def end_trace(root, token, error=None):
+    if root is None:
+        return
+    root.finish(error)
+    _current.reset(token)
+    exporter.export(root.trace)
+
+
+@contextlib.contextmanager
+def trace(name, **attributes):
+    """在請求以外（例如背景工作）自己開一個 trace"""
+    root, token = start_trace(name, **attributes)
+    try:
+        yield root
+    except BaseException as e:
+        end_trace(root, token, e)
+        raise
+    end_trace(root, token)
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """目前沒有 trace 時什麼都不做"""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.trace.add(Span(parent.trace, name, parent.span_id, attributes))
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.finish(e)
+        raise
+    else:
+        child.finish()
+    finally:
+        _current.reset(token)
+
+
+def annotate(**attributes):
+    current = _current.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def current_trace_id():
+    current = _current.get()
+    return current.trace.trace_id if current is not None else None
+
+
+def traceparent(root):
+    return f"00-{root.trace.trace_id}-{root.span_id}-01"
+
+
+def submit(executor, fn, *args):
+    """executor.submit，但讓工作裡的 span 接在目前的 trace 底下"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
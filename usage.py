@@ -0,0 +1,52 @@
+import threading
+
+from metrics import record_tokens
+
+# usage_metadata 裡要累計的欄位 → /api/stats 顯示的名稱
+USAGE_FIELDS = {
+    "prompt_token_count": "prompt",
+    "candidates_token_count": "output",
+    "cached_content_token_count": "cached",
+    "thoughts_token_count": "thoughts",
+    "total_token_count": "total",
+}
+
+
+class TokenUsage:
+    """累計每次 Gemini 回應的 usage_metadata，依入口（sync / async / stream / batch）分開統計"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.totals = {}
+        self.last = {}
+
+    def record(self, response, source="sync"):
+        meta = getattr(response, "usage_metadata", None)
+        if meta is None:
+            return None
+        counts = {name: getattr(meta, field, None) or 0 for field, name in USAGE_FIELDS.items()}
+        with self._lock:
+            self.requests[source] = self.requests.get(source, 0) + 1
+            totals = self.totals.setdefault(source, dict.fromkeys(USAGE_FIELDS.values(), 0))
+            for name, n in counts.items():
+                totals[name] += n
+            self.last = {"source": source, **counts}
+        record_tokens(source, counts)
+        return counts
+
+    def stats(self):
+        with self._lock:
+            by_source = {
+                source: {
+                    "requests": n,
+                    **self.totals[source],
+                    "avg_prompt": round(self.totals[source]["prompt"] / n, 1),
+                    "avg_output": round(self.totals[source]["output"] / n, 1),
+                }
+                for source, n in self.requests.items()
+            }
+            return {"by_source": by_source, "last": dict(self.last)}
+
+
+token_usage = TokenUsage()